@@ -0,0 +1,206 @@
+"""
+Generování přidělení auditů pro kampaň.
+
+Jedna implementace pro všechny endpointy (campaigns / assignments):
+- auditoři, linky, kategorie, mapa linka -> šablona a historie přidělení
+  se načtou předem (pevný počet dotazů bez ohledu na počet linek),
+- linky mezi aktivní auditory a kategorie rozdělí assignment_optimizer
+  (vyvážená zátěž podle kapacity + rotace podle minulých kampaní),
+- řádky se sestaví v paměti a vloží jedním hromadným INSERT ... RETURNING
+  (ID jsou potřeba pro emailové notifikace).
+"""
+
+from collections.abc import Callable
+from datetime import date
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from .models import (
+    User,
+    LpaCampaign,
+    LpaAssignment,
+    Line,
+    ChecklistTemplate,
+    ChecklistCategory,
+)
+from . import outbox
+from .assignment_optimizer import load_history, plan_assignments
+
+
+class GeneratedAssignment:
+    """
+    Nově vložené přidělení – hodnoty pro odpověď a emaily. Jen prosté
+    hodnoty, aby je šlo číst i po commitu bez donačítání objektů.
+    """
+
+    def __init__(
+        self,
+        id: int,
+        termin: date,
+        template_id: int,
+        auditor: User,
+        line: Line,
+        category: ChecklistCategory,
+    ):
+        self.id = id
+        self.termin = termin
+        self.template_id = template_id
+        self.auditor_id = auditor.id
+        self.auditor_name = auditor.jmeno
+        self.auditor_email = auditor.email
+        self.auditor_email_delivery = auditor.email_delivery
+        self.line_name = line.name
+        self.category_name = category.name
+
+
+def assignments_exist(db: Session, campaign_id: int) -> bool:
+    return db.query(
+        db.query(LpaAssignment).filter(LpaAssignment.campaign_id == campaign_id).exists()
+    ).scalar()
+
+
+def _template_map(db: Session) -> dict[int, int]:
+    """linka -> šablona (při více šablonách na linku ta nejstarší)"""
+    return dict(
+        db.query(ChecklistTemplate.line_id, func.min(ChecklistTemplate.id))
+        .group_by(ChecklistTemplate.line_id)
+        .all()
+    )
+
+
+def _active_auditors(db: Session) -> list[User]:
+    """Aktivní uživatelé s rolí auditor – i ti, kteří ji mají jen jako vedlejší"""
+    return (
+        db.query(User)
+        .filter(User.is_active.isnot(False))
+        .filter(User.role_filter("auditor"))
+        .order_by(User.id)
+        .all()
+    )
+
+
+def generate_assignments(
+    db: Session,
+    campaign: LpaCampaign,
+    deadline_for: Callable[[], date],
+) -> list[GeneratedAssignment]:
+    """
+    Vygeneruje přidělení pro všechny linky kampaně (bez commitu).
+    deadline_for() se volá pro každé přidělení zvlášť.
+
+    Nekontroluje, jestli kampaň už přidělení má – to je na volajícím
+    (assignments_exist), protože každý endpoint na to reaguje jinak.
+    """
+    auditors = _active_auditors(db)
+    if not auditors:
+        raise HTTPException(400, "Neexistují žádní auditoři")
+
+    lines = db.query(Line).order_by(Line.id).all()
+    if not lines:
+        raise HTTPException(400, "Neexistují žádné linky")
+
+    categories = db.query(ChecklistCategory).order_by(ChecklistCategory.id).all()
+    if not categories:
+        raise HTTPException(400, "Neexistují žádné checklist kategorie")
+
+    templates = _template_map(db)
+    missing = [line.name for line in lines if line.id not in templates]
+    if missing:
+        label = "linku" if len(missing) == 1 else "linky"
+        raise HTTPException(
+            400, f"Neexistuje checklist šablona pro {label} {', '.join(missing)}"
+        )
+
+    plan = plan_assignments(
+        [line.id for line in lines],
+        [(a.id, a.audit_capacity) for a in auditors],
+        [c.id for c in categories],
+        load_history(db, campaign.month),
+    )
+
+    auditors_by_id = {a.id: a for a in auditors}
+    categories_by_id = {c.id: c for c in categories}
+
+    rows = [
+        {
+            "campaign_id": campaign.id,
+            "auditor_id": auditor_id,
+            "line_id": line_id,
+            "template_id": templates[line_id],
+            "category_id": category_id,
+            "termin": deadline_for(),
+            "status": "pending",
+        }
+        for line_id, auditor_id, category_id in plan
+    ]
+
+    ids = db.scalars(
+        insert(LpaAssignment).returning(LpaAssignment.id, sort_by_parameter_order=True),
+        rows,
+    ).all()
+
+    return [
+        GeneratedAssignment(
+            id=assignment_id,
+            termin=row["termin"],
+            template_id=row["template_id"],
+            auditor=auditors_by_id[row["auditor_id"]],
+            line=line,
+            category=categories_by_id[row["category_id"]],
+        )
+        for assignment_id, row, line in zip(ids, rows, lines)
+    ]
+
+
+def queue_assignment_emails(
+    db: Session, campaign_month: str, generated: list[GeneratedAssignment]
+) -> int:
+    """
+    Zařadí notifikace o nových auditech do outboxu, seskupené podle auditora.
+    Auditor s preferencí "digest" dostane jeden souhrnný email se všemi
+    linkami, ostatní email ke každému auditu. Vrací počet zařazených emailů.
+    """
+    by_auditor: dict[int, list[GeneratedAssignment]] = {}
+    for assignment in generated:
+        by_auditor.setdefault(assignment.auditor_id, []).append(assignment)
+
+    queued = 0
+    for items in by_auditor.values():
+        first = items[0]
+
+        if first.auditor_email_delivery == "digest" and len(items) > 1:
+            outbox.enqueue_email(
+                db,
+                "audit_digest",
+                to_email=first.auditor_email,
+                auditor_name=first.auditor_name,
+                campaign_month=campaign_month,
+                assignments=[
+                    {
+                        "assignment_id": a.id,
+                        "line_name": a.line_name,
+                        "category_name": a.category_name,
+                        "deadline": a.termin.isoformat(),
+                    }
+                    for a in items
+                ],
+            )
+            queued += 1
+            continue
+
+        for a in items:
+            outbox.enqueue_email(
+                db,
+                "audit_assignment",
+                to_email=a.auditor_email,
+                auditor_name=a.auditor_name,
+                line_name=a.line_name,
+                category_name=a.category_name,
+                deadline=a.termin.isoformat(),
+                assignment_id=a.id,
+            )
+            queued += 1
+
+    return queued
@@ -0,0 +1,178 @@
+"""
+Rozdělení linek mezi auditory a kategorie – vyvážená zátěž + rotace.
+
+Místo dokola přidělování (auditors[i % n]) hladový algoritmus s cenou:
+- zátěž: počet přidělených linek – bere se nejméně vytížený, všichni
+  auditoři se měří stejně; nastavená kapacita (users.audit_capacity) je
+  jen horní limit – po jeho dosažení auditor z výběru vypadne,
+- rotace: za každé dřívější přidělení stejného auditora na stejnou linku
+  přirážka ROTATION_WEIGHT * DECAY^(stáří v měsících - 1), takže loňský
+  auditor linky prakticky nevadí, minulý měsíc hodně,
+- kategorie: pro linku ta, která na ní byla nejdávněji (stejná přirážka),
+  při shodě ta, která je v aktuální kampani zatím nejméně použitá.
+
+Složitost O(L · (log A + h)), kde h je počet auditorů, kteří linku
+v historii měli – u tisíců linek a stovek auditorů jde o desítky ms.
+Nejméně vytížený auditor bez historie na lince se bere z haldy, auditoři
+s historií se posuzují zvlášť.
+"""
+
+import heapq
+import math
+import os
+from collections import defaultdict
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .models import LpaAssignment, LpaCampaign
+
+load_dotenv()
+
+ROTATION_HISTORY_MONTHS = int(os.getenv("ROTATION_HISTORY_MONTHS", "6"))
+ROTATION_WEIGHT = 1.0
+ROTATION_DECAY = 0.5
+
+
+def load_history(db: Session, month: str) -> list[tuple[int, int, int, int | None]]:
+    """
+    Přidělení z posledních ROTATION_HISTORY_MONTHS kampaní před `month`.
+    Vrací (stáří v měsících od 1, auditor_id, line_id, category_id).
+    """
+    months = [
+        m
+        for (m,) in db.query(LpaCampaign.month)
+        .filter(LpaCampaign.month < month)
+        .order_by(LpaCampaign.month.desc())
+        .limit(ROTATION_HISTORY_MONTHS)
+        .all()
+    ]
+    if not months:
+        return []
+
+    age = {m: index + 1 for index, m in enumerate(months)}
+    rows = (
+        db.query(
+            LpaCampaign.month,
+            LpaAssignment.auditor_id,
+            LpaAssignment.line_id,
+            LpaAssignment.category_id,
+        )
+        .join(LpaCampaign, LpaAssignment.campaign_id == LpaCampaign.id)
+        .filter(LpaCampaign.month.in_(months))
+        .all()
+    )
+    return [(age[m], auditor_id, line_id, category_id) for m, auditor_id, line_id, category_id in rows]
+
+
+def _rotation_penalties(history):
+    """(auditor, linka) -> přirážka a (linka, kategorie) -> přirážka"""
+    auditor_penalty: dict[int, dict[int, float]] = defaultdict(dict)
+    category_penalty: dict[int, dict[int, float]] = defaultdict(dict)
+
+    for age, auditor_id, line_id, category_id in history:
+        weight = ROTATION_WEIGHT * ROTATION_DECAY ** (age - 1)
+        by_auditor = auditor_penalty[line_id]
+        by_auditor[auditor_id] = by_auditor.get(auditor_id, 0) + weight
+        if category_id is not None:
+            by_category = category_penalty[line_id]
+            by_category[category_id] = by_category.get(category_id, 0) + weight
+
+    return auditor_penalty, category_penalty
+
+
+def plan_assignments(
+    line_ids: list[int],
+    auditors: list[tuple[int, int | None]],
+    category_ids: list[int],
+    history: list[tuple[int, int, int, int | None]] = (),
+) -> list[tuple[int, int, int]]:
+    """
+    Rozdělí linky mezi auditory a kategorie.
+
+    Args:
+        line_ids: Linky kampaně
+        auditors: (auditor_id, kapacita) – kapacita None = bez limitu
+        category_ids: Kategorie k rotaci
+        history: Výstup load_history()
+
+    Returns:
+        (line_id, auditor_id, category_id) ve stejném pořadí jako line_ids
+    """
+    fixed_capacity = sum(c for _, c in auditors if c)
+    if all(c for _, c in auditors) and fixed_capacity < len(line_ids):
+        raise HTTPException(
+            400,
+            f"Kapacita auditorů ({fixed_capacity}) nestačí na počet linek ({len(line_ids)})",
+        )
+
+    # Zátěž v násobcích férového podílu – přirážka za rotaci je tak ve
+    # stejných jednotkách bez ohledu na počet linek a auditorů
+    fair_share = max(1, math.ceil(len(line_ids) / max(len(auditors), 1)))
+    hard_limit = {a: c for a, c in auditors if c}
+    load = {a: 0 for a, _ in auditors}
+
+    def ratio(auditor_id: int) -> float:
+        return (load[auditor_id] + 1) / fair_share
+
+    auditor_penalty, category_penalty = _rotation_penalties(history)
+
+    # Halda (zátěž, auditor); po přidělení se vloží nová položka a stará
+    # se pozná podle neaktuální zátěže a zahodí (líné mazání). Auditor,
+    # který dosáhl limitu, se do haldy už nevrací.
+    heap = [(ratio(a), a) for a, _ in auditors]
+    heapq.heapify(heap)
+
+    def is_current(item) -> bool:
+        return item[0] == ratio(item[1])
+
+    category_usage = {c: 0 for c in category_ids}
+    plan = {}
+
+    # Linky s nejdelší historií dřív – mají nejméně vhodných auditorů
+    for line_id in sorted(line_ids, key=lambda l: -len(auditor_penalty.get(l, ()))):
+        penalties = auditor_penalty.get(line_id, {})
+
+        # nejméně vytížený auditor, který linku v historii neměl
+        skipped = []
+        best_cost, best_auditor = math.inf, None
+        while heap:
+            item = heap[0]
+            if not is_current(item):
+                heapq.heappop(heap)
+            elif item[1] in penalties:
+                skipped.append(heapq.heappop(heap))
+            else:
+                best_cost, best_auditor = item
+                break
+        for item in skipped:
+            heapq.heappush(heap, item)
+
+        # auditoři s historií na lince – zátěž + přirážka za opakování
+        for auditor_id, penalty in penalties.items():
+            if auditor_id not in load:
+                continue  # už není aktivní auditor
+            if auditor_id in hard_limit and load[auditor_id] >= hard_limit[auditor_id]:
+                continue
+            cost = ratio(auditor_id) + penalty
+            if cost < best_cost:
+                best_cost, best_auditor = cost, auditor_id
+
+        if best_auditor is None:
+            raise HTTPException(400, "Kapacita auditorů nestačí na všechny linky")
+
+        load[best_auditor] += 1
+        if best_auditor not in hard_limit or load[best_auditor] < hard_limit[best_auditor]:
+            heapq.heappush(heap, (ratio(best_auditor), best_auditor))
+
+        line_categories = category_penalty.get(line_id, {})
+        category_id = min(
+            category_ids,
+            key=lambda c: (line_categories.get(c, 0), category_usage[c], c),
+        )
+        category_usage[category_id] += 1
+
+        plan[line_id] = (best_auditor, category_id)
+
+    return [(line_id, *plan[line_id]) for line_id in line_ids]
@@ -0,0 +1,111 @@
+"""
+Jednoduchá in-process TTL cache pro odpovědi dashboardu a detail neshody.
+
+Data dashboardu se mění jen při uložení odpovědi, zahájení/ukončení auditu
+nebo změně neshody – tyto zápisy volají dashboard_cache.invalidate().
+
+Invalidace platí jen v procesu, který zápis provedl. Při více API procesech
+(uvicorn --workers, více instancí) ostatní procesy vrací stará data až do
+vypršení TTL – proto jsou výchozí TTL krátké (desítky sekund). Kdo chce
+delší TTL, musí provozovat API v jednom procesu.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+DASHBOARD_CACHE_MAX_SIZE = int(os.getenv("DASHBOARD_CACHE_MAX_SIZE", "256"))
+
+NESHODA_CACHE_TTL = float(os.getenv("NESHODA_CACHE_TTL", "30"))
+NESHODA_CACHE_MAX_SIZE = int(os.getenv("NESHODA_CACHE_MAX_SIZE", "1024"))
+
+
+class TTLCache:
+    """LRU cache s omezenou velikostí a dobou platnosti záznamů"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key) -> tuple[bool, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key, compute: Callable[[], Any]):
+        found, value = self.get(key)
+        if found:
+            return value
+
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def delete_where(self, predicate: Callable[[Any], bool]):
+        """Smaže záznamy, jejichž hodnota splňuje predicate (bez dotazu do DB)"""
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            self.invalidations += len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0,
+                "invalidations": self.invalidations,
+            }
+
+
+dashboard_cache = TTLCache(DASHBOARD_CACHE_TTL, DASHBOARD_CACHE_MAX_SIZE)
+
+# Detail neshody podle id – maže se při každém přechodu stavu neshody
+# a při uložení odpovědí jejího auditu (mění se seznam NOK položek)
+neshoda_detail_cache = TTLCache(NESHODA_CACHE_TTL, NESHODA_CACHE_MAX_SIZE)
@@ -2,21 +2,17 @@
 Email service pro odesílání notifikací
 """
 
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
 import logging
 
 from .email_config import (
-    SMTP_HOST,
-    SMTP_PORT,
-    SMTP_USER,
-    SMTP_PASSWORD,
     SMTP_FROM,
     SMTP_FROM_NAME,
     FRONTEND_URL,
 )
+from . import smtp_pool
 
 logger = logging.getLogger(__name__)
 
@@ -59,11 +55,8 @@ class EmailService:
             part2 = MIMEText(html_body, "html", "utf-8")
             msg.attach(part2)
 
-            # Odeslání emailu
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USER, SMTP_PASSWORD)
-                server.send_message(msg)
+            # Odeslání přes sdílené (přihlášené) spojení z poolu
+            smtp_pool.get_pool().send_message(msg)
 
             logger.info(f"Email odeslán na {to_email}: {subject}")
             return True
@@ -196,6 +189,162 @@ def send_audit_assignment_email(
     return EmailService.send_email(to_email, subject, html_body, text_body)
 
 
+def send_audit_digest_email(
+    to_email: str,
+    auditor_name: str,
+    campaign_month: str,
+    assignments: list[dict],
+) -> bool:
+    """
+    Odešle souhrnný email se všemi audity přidělenými v kampani
+
+    Args:
+        assignments: Seznam auditů – dicty s klíči assignment_id, line_name,
+            category_name a deadline
+    """
+
+    assignments = sorted(assignments, key=lambda a: (a["deadline"], a["line_name"]))
+    count = len(assignments)
+
+    subject = f"Nové audity za {campaign_month} ({count})"
+
+    rows_html = "".join(
+        f"""
+                        <tr>
+                            <td>{a["line_name"]}</td>
+                            <td>{a["category_name"]}</td>
+                            <td>{a["deadline"]}</td>
+                            <td><a href="{FRONTEND_URL}/assignments/{a["assignment_id"]}">Detail</a></td>
+                        </tr>"""
+        for a in assignments
+    )
+
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                line-height: 1.6;
+                color: #333;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 0 auto;
+                padding: 20px;
+            }}
+            .header {{
+                background-color: #2563eb;
+                color: white;
+                padding: 20px;
+                text-align: center;
+                border-radius: 5px 5px 0 0;
+            }}
+            .content {{
+                background-color: #f9fafb;
+                padding: 30px;
+                border: 1px solid #e5e7eb;
+            }}
+            table {{
+                width: 100%;
+                border-collapse: collapse;
+                background-color: white;
+                margin: 15px 0;
+            }}
+            th, td {{
+                padding: 8px 10px;
+                text-align: left;
+                border-bottom: 1px solid #e5e7eb;
+            }}
+            th {{
+                background-color: #eff6ff;
+                color: #1e3a8a;
+            }}
+            .button {{
+                display: inline-block;
+                padding: 12px 24px;
+                background-color: #2563eb;
+                color: white;
+                text-decoration: none;
+                border-radius: 5px;
+                margin-top: 20px;
+            }}
+            .footer {{
+                text-align: center;
+                margin-top: 30px;
+                padding-top: 20px;
+                border-top: 1px solid #e5e7eb;
+                color: #6b7280;
+                font-size: 12px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🔍 Nové audity za {campaign_month}</h1>
+            </div>
+            <div class="content">
+                <p>Dobrý den <strong>{auditor_name}</strong>,</p>
+                
+                <p>v kampani {campaign_month} Vám byly přiděleny tyto audity (<strong>{count}</strong>):</p>
+                
+                <table>
+                    <thead>
+                        <tr>
+                            <th>📍 Linka</th>
+                            <th>📋 Kategorie</th>
+                            <th>📅 Termín</th>
+                            <th></th>
+                        </tr>
+                    </thead>
+                    <tbody>{rows_html}
+                    </tbody>
+                </table>
+                
+                <p>Prosím, proveďte audity do stanovených termínů.</p>
+                
+                <a href="{FRONTEND_URL}/assignments" class="button">
+                    Zobrazit moje audity
+                </a>
+                
+                <div class="footer">
+                    <p>Tento email byl odeslán automaticky z LPA systému.</p>
+                    <p>Pro přístup do systému použijte: <a href="{FRONTEND_URL}">{FRONTEND_URL}</a></p>
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+    rows_text = "\n".join(
+        f"    - {a['line_name']} / {a['category_name']}, termín {a['deadline']}: "
+        f"{FRONTEND_URL}/assignments/{a['assignment_id']}"
+        for a in assignments
+    )
+
+    text_body = f"""
+    Nové audity za {campaign_month}
+    
+    Dobrý den {auditor_name},
+    
+    v kampani {campaign_month} Vám byly přiděleny tyto audity ({count}):
+    
+{rows_text}
+    
+    Prosím, proveďte audity do stanovených termínů.
+    
+    Přehled auditů: {FRONTEND_URL}/assignments
+    
+    ---
+    Tento email byl odeslán automaticky z LPA systému.
+    """
+
+    return EmailService.send_email(to_email, subject, html_body, text_body)
+
+
 def send_issue_assignment_email(
     to_email: str,
     solver_name: str,
@@ -0,0 +1,113 @@
+"""
+Streamované exporty (CSV / XLSX) pro přehledy auditů a NOK odpovědí.
+
+Řádky se čtou po dávkách přes server-side kurzor (yield_per) ve vlastní
+DB session – session z Depends(get_db) se zavírá dřív, než se odešle tělo
+odpovědi. Paměť je konstantní bez ohledu na počet řádků:
+- CSV se posílá průběžně po blocích,
+- XLSX zapisuje openpyxl ve write-only režimu do dočasného souboru,
+  ten se pak posílá po blocích (ZIP kontejner nejde psát rovnou do sítě).
+
+XLSX vyžaduje openpyxl (pip install openpyxl).
+"""
+
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Query, Session
+
+from .database import SessionLocal
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl je volitelný, bez něj jen CSV
+    Workbook = None
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_BATCH_SIZE = 1000
+STREAM_CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def iter_query_rows(build_query: Callable[[Session], Query], to_row: Callable) -> Iterator[list]:
+    """Řádky exportu z dotazu ve vlastní session, načítané po dávkách"""
+    db = SessionLocal()
+    try:
+        for result in build_query(db).yield_per(EXPORT_BATCH_SIZE):
+            yield to_row(*result)
+    finally:
+        db.close()
+
+
+def _csv_chunks(columns: list[str], rows: Iterable[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    # BOM + středník, aby soubor rovnou otevřel český Excel
+    buffer.write("\ufeff")
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(columns)
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= STREAM_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _xlsx_cell(value):
+    # Excel neumí datum s časovým pásmem
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return value
+
+
+def _xlsx_chunks(sheet_title: str, columns: list[str], rows: Iterable[list]) -> Iterator[bytes]:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([_xlsx_cell(value) for value in row])
+
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(STREAM_CHUNK_BYTES):
+            yield chunk
+
+
+def export_response(
+    fmt: str,
+    filename_stem: str,
+    sheet_title: str,
+    columns: list[str],
+    rows: Iterable[list],
+) -> StreamingResponse:
+    """StreamingResponse s exportem ve formátu csv / xlsx"""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Formát musí být 'csv' nebo 'xlsx'")
+    if fmt == "xlsx" and Workbook is None:
+        raise HTTPException(status_code=501, detail="Export do XLSX vyžaduje openpyxl")
+
+    chunks = (
+        _csv_chunks(columns, rows)
+        if fmt == "csv"
+        else _xlsx_chunks(sheet_title, columns, rows)
+    )
+    filename = f"{filename_stem}_{date.today().isoformat()}.{fmt}"
+
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,10 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from .routers import dashboard
 from .routers import allocations
 
 from .database import engine, Base
+from . import outbox, photo_derivatives, report_pdf, smtp_pool
 
 from .routers import (
     users,
@@ -16,8 +16,11 @@ from .routers import (
     answers,
     neshody,
     auth,
+    photos,
+    search,
 )
 from .routers import executions
+from .routers import analytics
 
 
 app = FastAPI(title="LPA v2 API", redirect_slashes=False)
@@ -31,13 +34,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
-
 # Vytvoření tabulek (prozatím – později přejdeme na Alembic)
 Base.metadata.create_all(bind=engine)
 
 
+@app.on_event("startup")
+def start_workers():
+    if outbox.OUTBOX_WORKER_ENABLED:
+        outbox.start_worker()
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    outbox.stop_worker()
+    photo_derivatives.shutdown()
+    report_pdf.shutdown()
+    smtp_pool.shutdown()
+
+
 @app.get("/")
 def root():
     return {"message": "LPA v2 backend running"}
@@ -56,3 +70,6 @@ app.include_router(neshody.router, prefix="/neshody", tags=["neshody"])
 app.include_router(executions.router, prefix="/executions", tags=["executions"])
 app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 app.include_router(allocations.router, prefix="/allocations", tags=["allocations"])
+app.include_router(photos.router, prefix="/uploads", tags=["photos"])
+app.include_router(search.router, prefix="/search", tags=["search"])
+app.include_router(analytics.router)  # prefix /analytics je přímo v routeru
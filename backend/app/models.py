@@ -1,5 +1,19 @@
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Date,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    Index,
+    JSON,
+    UniqueConstraint,
+    and_,
+    func,
+    or_,
+)
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -21,6 +35,10 @@ class User(Base):
     roles = Column(String, nullable=True)
     force_password_change = Column(Boolean, default=True)
     is_active = Column(Boolean, default=True)
+    # Notifikace o nových auditech: "digest" (jeden souhrn za kampaň) / "immediate"
+    email_delivery = Column(String, nullable=False, default="digest", server_default="digest")
+    # Max. počet auditů za měsíc (NULL = bez limitu, rozdělí se rovnoměrně)
+    audit_capacity = Column(Integer, nullable=True)
 
     # ✅ PŘIDEJTE TYTO DVĚ METODY
     def has_role(self, role_name: str) -> bool:
@@ -29,6 +47,14 @@ class User(Base):
             return self.role == role_name
         return role_name in self.roles.split(",")
 
+    @classmethod
+    def role_filter(cls, role_name: str):
+        """SQL obdoba has_role() pro filtrování v dotazech"""
+        return or_(
+            and_(func.coalesce(cls.roles, "") == "", cls.role == role_name),
+            ("," + cls.roles + ",").like(f"%,{role_name},%"),
+        )
+
     def get_roles_list(self) -> list:
         """Vrátí seznam všech rolí"""
         if not self.roles:
@@ -66,7 +92,7 @@ class LpaAssignment(Base):
     __tablename__ = "lpa_assignments"
 
     id = Column(Integer, primary_key=True, index=True)
-    campaign_id = Column(Integer, ForeignKey("lpa_campaigns.id"))
+    campaign_id = Column(Integer, ForeignKey("lpa_campaigns.id"), index=True)
     auditor_id = Column(Integer, ForeignKey("users.id"))
     line_id = Column(Integer, ForeignKey("lines.id"))
     template_id = Column(Integer, ForeignKey("checklist_templates.id"), nullable=True)
@@ -81,6 +107,10 @@ class LpaAssignment(Base):
 # ===========================
 class AuditExecution(Base):
     __tablename__ = "audit_execution"
+    __table_args__ = (
+        # Keyset stránkování /executions/list
+        Index("ix_audit_execution_started_at_id", "started_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("lpa_assignments.id"))
@@ -89,6 +119,11 @@ class AuditExecution(Base):
     finished_at = Column(DateTime, nullable=True)
     status = Column(String, default="in_progress")  # in_progress / done
 
+    # Počitadla odpovědí – udržuje save_answer, backfill: migrate_execution_counters.py
+    ok_count = Column(Integer, nullable=False, default=0, server_default="0")
+    nok_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_count = Column(Integer, nullable=False, default=0, server_default="0")
+
 
 # ===========================
 # CHECKLIST – ŠABLONY
@@ -129,23 +164,84 @@ class ChecklistQuestion(Base):
 # ===========================
 class AuditAnswer(Base):
     __tablename__ = "audit_answers"
+    __table_args__ = (
+        # Jedna odpověď na otázku v rámci auditu (cíl pro ON CONFLICT upsert)
+        UniqueConstraint(
+            "audit_execution_id", "question_id",
+            name="uq_audit_answers_execution_question",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     audit_execution_id = Column(Integer, ForeignKey("audit_execution.id"))
     question_id = Column(Integer, ForeignKey("checklist_questions.id"))
     odpoved = Column(String, nullable=True)
     picture_url = Column(String, nullable=True)
+    photo_id = Column(Integer, ForeignKey("photos.id"), nullable=True, index=True)
     has_issue = Column(Boolean, default=False)
 
 
+# ===========================
+# ULOŽENÉ FOTKY (podle obsahu)
+# ===========================
+class StoredPhoto(Base):
+    """
+    Jedna fyzická fotka v úložišti. Soubor je pojmenovaný podle SHA-256
+    obsahu (uploads/ab/cd/<hash>.jpg), takže stejná fotka je uložená jen
+    jednou a odpovědi na ni odkazují přes audit_answers.photo_id.
+    """
+    __tablename__ = "photos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    path = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# ===========================
+# MĚSÍČNÍ ROLLUP STATISTIK
+# ===========================
+class AuditStatsMonthly(Base):
+    """
+    Předpočítané počty pro /dashboard/stats/*.
+    Udržuje se inkrementálně (viz stats_rollup.py), přepočet: rebuild_stats.py.
+    Klíčové sloupce nemají FK – 0 znamená "nevyplněno" (např. přidělení bez kategorie).
+    """
+
+    __tablename__ = "audit_stats_monthly"
+    __table_args__ = (
+        UniqueConstraint(
+            "month", "line_id", "category_id", "auditor_id",
+            name="uq_audit_stats_monthly_key",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String, nullable=False, index=True)  # "2026-03" (LpaCampaign.month)
+    line_id = Column(Integer, nullable=False, default=0)
+    category_id = Column(Integer, nullable=False, default=0)
+    auditor_id = Column(Integer, nullable=False, default=0)
+
+    executions_count = Column(Integer, nullable=False, default=0)
+    done_count = Column(Integer, nullable=False, default=0)
+    ok_count = Column(Integer, nullable=False, default=0)
+    nok_count = Column(Integer, nullable=False, default=0)
+
+
 # ===========================
 # NESHODY (WORKFLOW)
 # ===========================
 class Neshoda(Base):
     __tablename__ = "neshody"
+    __table_args__ = (
+        # Nejvýš jedna neshoda na NOK odpověď (cíl pro ON CONFLICT)
+        UniqueConstraint("answer_id", name="uq_neshody_answer"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     audit_execution_id = Column(Integer, ForeignKey("audit_execution.id"))
+    answer_id = Column(Integer, ForeignKey("audit_answers.id"), nullable=True)
 
     popis = Column(String, nullable=False)
     zavaznost = Column(String)  # low / medium / high
@@ -174,3 +270,31 @@ class Line(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False)
+
+
+# ===========================
+# EMAIL OUTBOX
+# ===========================
+class EmailOutbox(Base):
+    """
+    Emaily čekající na odeslání. Zapisují se ve stejné transakci jako
+    business změna (přidělení, neshoda) a odesílá je worker na pozadí
+    (app/outbox.py) s opakováním a backoffem.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # audit_assignment / issue_assignment
+    to_email = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+
+    status = Column(String, nullable=False, default="pending")  # pending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
@@ -0,0 +1,177 @@
+"""
+Email outbox – spolehlivé odesílání emailů mimo request.
+
+Endpointy jen zapíšou řádek do email_outbox ve stejné transakci jako
+business změnu (enqueue_email) – když transakce spadne, email nevznikne,
+a když projde, email se určitě odešle. Odesílá worker na pozadí:
+- dávky řádků zamyká přes FOR UPDATE SKIP LOCKED, takže může běžet
+  ve více procesech najednou,
+- dávku posílá souběžně přes pool SMTP spojení (smtp_pool), takže se
+  přihlášená spojení znovu používají napříč zprávami,
+- neúspěšné pokusy opakuje s exponenciálním backoffem,
+- po OUTBOX_MAX_ATTEMPTS pokusech zprávu označí jako failed.
+
+Worker běží jako vlákno v API procesu (OUTBOX_WORKER_ENABLED=1), nebo
+samostatně: python outbox_worker.py
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import EmailOutbox
+from .email_service import (
+    send_audit_assignment_email,
+    send_audit_digest_email,
+    send_issue_assignment_email,
+)
+from .smtp_pool import SMTP_POOL_SIZE
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKER_ENABLED = os.getenv("OUTBOX_WORKER_ENABLED", "1") == "1"
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_SECONDS = 30
+OUTBOX_MAX_BACKOFF_SECONDS = 3600
+# Souběžné odesílání v dávce – víc nemá smysl, než kolik dá pool spojení
+OUTBOX_SEND_CONCURRENCY = int(os.getenv("OUTBOX_SEND_CONCURRENCY", str(SMTP_POOL_SIZE)))
+
+# druh zprávy -> funkce, která ji vyrenderuje a odešle (vrací True/False)
+SENDERS = {
+    "audit_assignment": send_audit_assignment_email,
+    "audit_digest": send_audit_digest_email,
+    "issue_assignment": send_issue_assignment_email,
+}
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def enqueue_email(db: Session, kind: str, to_email: str, **payload):
+    """
+    Zařadí email do outboxu v rámci aktuální transakce (bez commitu).
+    Payload musí být JSON – datumy předávejte jako isoformat().
+    """
+    if kind not in SENDERS:
+        raise ValueError(f"Neznámý druh emailu: {kind}")
+    db.add(EmailOutbox(kind=kind, to_email=to_email, payload=payload))
+
+
+def wake():
+    """Probudí worker hned po commitu (jinak se zprávy vezmou při dalším pollu)"""
+    _wake.set()
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    seconds = OUTBOX_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+def _send(kind: str, to_email: str, payload: dict) -> str | None:
+    """Odešle jednu zprávu, vrací chybu (None = odesláno)"""
+    try:
+        if not SENDERS[kind](to_email=to_email, **payload):
+            return "Odeslání selhalo (SMTP)"
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def _record_result(message: EmailOutbox, error: str | None):
+    now = datetime.utcnow()
+    message.attempts += 1
+    if error is None:
+        message.status = "sent"
+        message.sent_at = now
+        message.last_error = None
+    elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+        message.status = "failed"
+        message.last_error = error
+        logger.error(f"Email {message.id} na {message.to_email} definitivně selhal: {error}")
+    else:
+        message.next_attempt_at = now + backoff_delay(message.attempts)
+        message.last_error = error
+
+
+def process_batch(db: Session) -> int:
+    """Odešle jednu dávku splatných zpráv. Vrací počet zpracovaných."""
+    messages = (
+        db.query(EmailOutbox)
+        .filter(
+            EmailOutbox.status == "pending",
+            EmailOutbox.next_attempt_at <= datetime.utcnow(),
+        )
+        .order_by(EmailOutbox.id)
+        .limit(OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    # Vlákna dostanou jen data zprávy, ORM objekty se mění až tady
+    jobs = [(m.kind, m.to_email, m.payload) for m in messages]
+    if OUTBOX_SEND_CONCURRENCY > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=OUTBOX_SEND_CONCURRENCY) as executor:
+            errors = list(executor.map(lambda job: _send(*job), jobs))
+    else:
+        errors = [_send(*job) for job in jobs]
+
+    for message, error in zip(messages, errors):
+        _record_result(message, error)
+
+    db.commit()
+    return len(messages)
+
+
+def drain() -> int:
+    """Zpracovává dávky, dokud je co odesílat. Vrací celkový počet."""
+    total = 0
+    while not _stop.is_set():
+        db = SessionLocal()
+        try:
+            processed = process_batch(db)
+        finally:
+            db.close()
+        total += processed
+        if processed < OUTBOX_BATCH_SIZE:
+            break
+    return total
+
+
+def run_worker():
+    """Smyčka workeru – běží do stop_worker()"""
+    while not _stop.is_set():
+        try:
+            drain()
+        except Exception as e:
+            logger.error(f"Chyba outbox workeru: {e}")
+        _wake.wait(OUTBOX_POLL_SECONDS)
+        _wake.clear()
+
+
+def start_worker():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=run_worker, name="email-outbox", daemon=True)
+    _thread.start()
+
+
+def stop_worker():
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout=10)
+        _thread = None
@@ -0,0 +1,54 @@
+"""
+Podepsané URL fotek pro <img src>.
+
+Prohlížeč u <img> neumí poslat hlavičku Authorization a session JWT v URL
+by skončil v logách proxy, historii i v Refereru. API proto k fotkám vrací
+URL s podpisem HMAC(cesta + expirace) – platí jen pro jednu fotku a jen
+omezenou dobu.
+
+Expirace se zaokrouhluje na konec okna PHOTO_URL_TTL (platnost je mezi
+TTL a 2×TTL), takže URL fotky je v rámci okna stejná pro všechny
+uživatele i relace a prohlížeč ji může cachovat (immutable).
+"""
+
+import hashlib
+import hmac
+import os
+import time
+from urllib.parse import urlencode
+
+from dotenv import load_dotenv
+
+from .auth import SECRET_KEY
+
+load_dotenv()
+
+PHOTO_URL_SECRET = os.getenv("PHOTO_URL_SECRET") or SECRET_KEY
+PHOTO_URL_TTL = int(os.getenv("PHOTO_URL_TTL", str(24 * 3600)))
+
+
+def _normalize(path: str) -> str:
+    # cesty z os.path.join mají na Windows zpětná lomítka
+    return path.replace("\\", "/").lstrip("/")
+
+
+def _signature(path: str, expires: int) -> str:
+    message = f"{path}\n{expires}".encode("utf-8")
+    return hmac.new(PHOTO_URL_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def signed_url(path: str | None) -> str | None:
+    """Relativní URL fotky s podpisem (uploads/...?expires=...&signature=...)"""
+    if not path:
+        return None
+    path = _normalize(path)
+    expires = (int(time.time()) // PHOTO_URL_TTL + 2) * PHOTO_URL_TTL
+    query = urlencode({"expires": expires, "signature": _signature(path, expires)})
+    return f"{path}?{query}"
+
+
+def verify(path: str, expires: int, signature: str) -> bool:
+    """Platný a neprošlý podpis pro danou cestu"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(_normalize(path), expires), signature)
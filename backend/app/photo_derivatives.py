@@ -0,0 +1,139 @@
+"""
+Náhledy fotek z auditů (WebP thumbnail + střední náhled).
+
+Generují se na pozadí v process poolu až po commitu odpovědi, takže request
+na ně nečeká. Náhledy mají deterministickou cestu odvozenou od originálu;
+dokud nejsou hotové, API vrací místo nich originál.
+
+Vyžaduje Pillow (pip install pillow). Bez něj se náhledy negenerují
+a všude se používá originál.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow je volitelný
+    Image = None
+    ImageOps = None
+
+from .uploads import UPLOAD_DIR
+from . import photo_access
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = os.path.join(UPLOAD_DIR, "derivatives")
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))
+
+# název varianty -> (max. rozměr v px, kvalita WebP)
+VARIANTS = {
+    "thumb": (320, 75),
+    "medium": (1280, 82),
+}
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def derivative_path(picture_url: str, variant: str) -> str:
+    """Cesta k náhledu dané varianty pro originál picture_url (stejné shardování jako originál)"""
+    stem = os.path.splitext(os.path.basename(picture_url))[0]
+    return os.path.join(DERIVATIVES_DIR, stem[:2], stem[2:4], f"{stem}_{variant}.webp")
+
+
+def derivative_url(picture_url: str | None, variant: str) -> str | None:
+    """Náhled, pokud už existuje, jinak originál (nebo None bez fotky)"""
+    if not picture_url:
+        return None
+    path = derivative_path(picture_url, variant)
+    return path if os.path.exists(path) else picture_url
+
+
+def photo_urls(picture_url: str | None) -> dict:
+    """
+    Pole s náhledy pro API odpovědi (vedle původního picture_url).
+    *_url jsou cesty k souborům, *_src podepsané URL pro <img src>.
+    """
+    thumbnail_url = derivative_url(picture_url, "thumb")
+    preview_url = derivative_url(picture_url, "medium")
+    return {
+        "thumbnail_url": thumbnail_url,
+        "preview_url": preview_url,
+        "picture_src": photo_access.signed_url(picture_url),
+        "thumbnail_src": photo_access.signed_url(thumbnail_url),
+        "preview_src": photo_access.signed_url(preview_url),
+    }
+
+
+def generate_derivatives(picture_url: str, force: bool = False) -> list[str]:
+    """
+    Vygeneruje chybějící náhledy pro jednu fotku. Běží v worker procesu.
+    Vrací seznam nově vytvořených souborů.
+    """
+    if Image is None or not os.path.exists(picture_url):
+        return []
+
+    targets = {
+        variant: derivative_path(picture_url, variant)
+        for variant in VARIANTS
+    }
+    if not force:
+        targets = {v: p for v, p in targets.items() if not os.path.exists(p)}
+    if not targets:
+        return []
+
+    os.makedirs(os.path.dirname(next(iter(targets.values()))), exist_ok=True)
+    created = []
+
+    with Image.open(picture_url) as img:
+        img.draft("RGB", (max(size for size, _ in VARIANTS.values()),) * 2)  # rychlejší dekód JPEG
+        img = ImageOps.exif_transpose(img).convert("RGB")
+
+        # od největší varianty k nejmenší, každá se zmenšuje z předchozí
+        for variant in sorted(targets, key=lambda v: VARIANTS[v][0], reverse=True):
+            size, quality = VARIANTS[variant]
+            img.thumbnail((size, size), Image.LANCZOS)
+
+            # zápis přes dočasný soubor, aby nikdo neviděl polovičatý náhled
+            tmp_path = targets[variant] + ".tmp"
+            img.save(tmp_path, "WEBP", quality=quality, method=4)
+            os.replace(tmp_path, targets[variant])
+            created.append(targets[variant])
+
+    return created
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PHOTO_WORKERS)
+    return _executor
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error:
+        logger.error(f"Chyba při generování náhledu fotky: {error}")
+
+
+def schedule_derivatives(picture_urls):
+    """Naplánuje generování náhledů na pozadí (neblokuje request)"""
+    if Image is None:
+        return
+
+    executor = _get_executor()
+    for picture_url in picture_urls:
+        if picture_url:
+            executor.submit(generate_derivatives, picture_url).add_done_callback(_log_failure)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
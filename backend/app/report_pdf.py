@@ -0,0 +1,178 @@
+"""
+PDF report dokončeného auditu.
+
+Vykreslení běží v process poolu (API worker jen čeká na výsledek) a hotové
+PDF se ukládá na disk pod klíčem execution + otisk odpovědí. Dokud se
+odpovědi nezmění, servíruje se uložený soubor; po změně vznikne nový
+a starší verze pro stejný audit se smažou.
+
+Vyžaduje reportlab (pip install reportlab). Pro českou diakritiku je potřeba
+TTF font (REPORT_FONT_PATH, jinak se zkusí DejaVuSans / Arial).
+"""
+
+import asyncio
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from dotenv import load_dotenv
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:  # reportlab je volitelný
+    SimpleDocTemplate = None
+
+load_dotenv()
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "1"))
+
+FONT_CANDIDATES = [
+    os.getenv("REPORT_FONT_PATH", ""),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def is_available() -> bool:
+    return SimpleDocTemplate is not None
+
+
+def report_fingerprint(report: dict) -> str:
+    """
+    Otisk obsahu reportu – mění se jen se změnou odpovědí nebo stavu auditu.
+    Náhledy fotek se nezapočítávají (dogenerování náhledu není změna).
+    """
+    payload = {
+        **report,
+        "answers": [
+            (a["question_id"], a["odpoved"], a["picture_url"]) for a in report["answers"]
+        ],
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def report_path(execution_id: int, fingerprint: str) -> str:
+    return os.path.join(REPORTS_DIR, f"execution_{execution_id}_{fingerprint}.pdf")
+
+
+def _register_font() -> str:
+    for path in FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            pdfmetrics.registerFont(TTFont("ReportFont", path))
+            return "ReportFont"
+    return "Helvetica"
+
+
+def render_report(report: dict, output_path: str) -> str:
+    """Vykreslí report do PDF. Běží ve worker procesu."""
+    font = _register_font()
+    styles = getSampleStyleSheet()
+    for style in styles.byName.values():
+        style.fontName = font
+    cell = styles["BodyText"]
+
+    assignment = report["assignment"]
+    execution = report["execution"]
+
+    story = [
+        Paragraph(escape(f"LPA audit – {report['line']} / {report['category']}"), styles["Title"]),
+        Paragraph(
+            escape(
+                f"Měsíc: {report['campaign_month']}   Auditor: {report['auditor'] or '—'}   "
+                f"Termín: {assignment['termin'] or '—'}"
+            ),
+            cell,
+        ),
+        Paragraph(
+            f"Zahájeno: {execution['started_at'] or '—'}   "
+            f"Dokončeno: {execution['finished_at'] or '—'}",
+            cell,
+        ),
+        Spacer(1, 6 * mm),
+    ]
+
+    rows = [["#", "Otázka", "Odpověď", "Fotka"]]
+    for answer in report["answers"]:
+        photo = ""
+        photo_path = answer.get("thumbnail_url") or answer.get("picture_url")
+        if photo_path and os.path.exists(photo_path):
+            try:
+                photo = Image(photo_path, width=35 * mm, height=26 * mm, kind="proportional")
+            except Exception:
+                photo = "(fotku nelze načíst)"
+        rows.append(
+            [
+                answer["position"],
+                Paragraph(escape(answer["question_text"] or ""), cell),
+                answer["odpoved"],
+                photo,
+            ]
+        )
+
+    table = Table(rows, colWidths=[10 * mm, 100 * mm, 20 * mm, 40 * mm], repeatRows=1)
+    table_style = [
+        ("FONTNAME", (0, 0), (-1, -1), font),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ]
+    for index, answer in enumerate(report["answers"], start=1):
+        if answer["odpoved"] == "NOK":
+            table_style.append(("TEXTCOLOR", (2, index), (2, index), colors.red))
+    table.setStyle(TableStyle(table_style))
+    story.append(table)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    SimpleDocTemplate(tmp_path, pagesize=A4, title="LPA audit").build(story)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS)
+    return _executor
+
+
+def _remove_stale(execution_id: int, keep_path: str):
+    for path in glob.glob(os.path.join(REPORTS_DIR, f"execution_{execution_id}_*.pdf")):
+        if path != keep_path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+async def get_or_render(execution_id: int, report: dict) -> str:
+    """Cesta k PDF reportu – z cache na disku, nebo nově vykreslenému v process poolu"""
+    path = report_path(execution_id, report_fingerprint(report))
+    if os.path.exists(path):
+        return path
+
+    future = _get_executor().submit(render_report, report, path)
+    await asyncio.wrap_future(future)
+    _remove_stale(execution_id, path)
+    return path
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select
 from datetime import date
 from ..auth import get_db, get_current_user
-from ..models import AuditExecution, AuditAnswer, ChecklistCategory, Neshoda
+from ..models import AuditExecution, Neshoda
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -14,41 +15,40 @@ def get_dashboard_data(
     # Celková data za aktuální měsíc
     today = date.today()
     month_start = date(today.year, today.month, 1)
+    in_month = AuditExecution.started_at >= month_start
 
-    executions = (
-        db.query(AuditExecution)
-        .filter(AuditExecution.started_at >= month_start)
-        .all()
+    # Neshody k auditům tohoto měsíce – jako skalární poddotazy
+    neshody_base = (
+        select(func.count(Neshoda.id))
+        .join(AuditExecution, Neshoda.audit_execution_id == AuditExecution.id)
+        .where(in_month)
     )
-
-    execution_ids = [e.id for e in executions]
-
-    answers = (
-        db.query(AuditAnswer)
-        .filter(AuditAnswer.audit_execution_id.in_(execution_ids))
-        .all()
-    )
-
-    total = len(answers)
-    ok = sum(1 for a in answers if a.odpoved == "ok")
-    nok = sum(1 for a in answers if a.odpoved == "nok")
-
-    neshody = (
-        db.query(Neshoda)
-        .filter(Neshoda.audit_execution_id.in_(execution_ids))
-        .all()
+    neshody_total = neshody_base.scalar_subquery()
+    neshody_open = neshody_base.where(Neshoda.status != "closed").scalar_subquery()
+
+    totals = (
+        db.query(
+            func.count(AuditExecution.id).label("audits_count"),
+            func.coalesce(func.sum(AuditExecution.total_count), 0).label("total"),
+            func.coalesce(func.sum(AuditExecution.ok_count), 0).label("ok"),
+            func.coalesce(func.sum(AuditExecution.nok_count), 0).label("nok"),
+            neshody_total.label("neshody_total"),
+            neshody_open.label("neshody_open"),
+        )
+        .filter(in_month)
+        .one()
     )
 
-    open_neshody = sum(1 for n in neshody if n.status != "closed")
+    total = totals.total
 
     return {
         "kpi": {
-            "audits_count": len(executions),
+            "audits_count": totals.audits_count,
             "total_questions": total,
-            "ok": ok,
-            "nok": nok,
-            "percent_ok": round((ok / total) * 100 if total else 0, 1),
-            "neshody_total": len(neshody),
-            "neshody_open": open_neshody,
+            "ok": totals.ok,
+            "nok": totals.nok,
+            "percent_ok": round((totals.ok / total) * 100 if total else 0, 1),
+            "neshody_total": totals.neshody_total,
+            "neshody_open": totals.neshody_open,
         }
     }
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from datetime import datetime, date
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from datetime import date
 from typing import Optional
+from pydantic import BaseModel
+import json
 
 from ..auth import get_db, get_current_user
 from ..models import (
@@ -16,9 +19,86 @@ from ..models import (
     ChecklistCategory,
     LpaCampaign,
 )
+from .. import photo_derivatives, stats_rollup
+from ..cache import dashboard_cache, neshoda_detail_cache
+from ..exports import export_response, iter_query_rows
+from ..uploads import StagedUpload, stage_upload, store_photo
 
 router = APIRouter()
 
+ANSWER_KEY = "uq_audit_answers_execution_question"
+NESHODA_ANSWER_KEY = "uq_neshody_answer"
+
+
+def _upsert_answer(db: Session, audit_execution_id: int, question_id: int, values: dict):
+    """
+    Atomický upsert odpovědi nad unikátním klíčem (execution, otázka).
+
+    Nová odpověď = jeden INSERT … ON CONFLICT DO NOTHING. Při konfliktu
+    se existující řádek zamkne a přepíše jedním UPDATE, který vrátí
+    původní hodnotu (kvůli počitadlům). Vrací (answer_id, old_odpoved, inserted).
+    """
+    answers = AuditAnswer.__table__
+
+    inserted_id = db.execute(
+        insert(answers)
+        .values(audit_execution_id=audit_execution_id, question_id=question_id, **values)
+        .on_conflict_do_nothing(constraint=ANSWER_KEY)
+        .returning(answers.c.id)
+    ).scalar()
+    if inserted_id is not None:
+        return inserted_id, None, True
+
+    previous = (
+        select(answers.c.id, answers.c.odpoved)
+        .where(
+            answers.c.audit_execution_id == audit_execution_id,
+            answers.c.question_id == question_id,
+        )
+        .with_for_update()
+        .subquery()
+    )
+    answer_id, old_odpoved = db.execute(
+        update(answers)
+        .where(answers.c.id == previous.c.id)
+        .values(**values)
+        .returning(previous.c.id, previous.c.odpoved)
+    ).one()
+    return answer_id, old_odpoved, False
+
+
+def _evict_neshoda_details(audit_execution_id: int):
+    """Detail neshody obsahuje NOK položky auditu – zahodit jen neshody tohoto auditu"""
+    neshoda_detail_cache.delete_where(
+        lambda detail: detail["audit_info"]["execution_id"] == audit_execution_id
+    )
+
+
+def _open_neshody(db: Session, audit_execution_id: int, nok_answers: list[tuple[int, str | None]]):
+    """
+    Automatická neshoda pro NOK odpovědi [(answer_id, poznamka)].
+    Odpověď, která už neshodu má (opakované uložení), se přeskočí.
+    """
+    if not nok_answers:
+        return
+    db.execute(
+        insert(Neshoda)
+        .values(
+            [
+                {
+                    "audit_execution_id": audit_execution_id,
+                    "answer_id": answer_id,
+                    "popis": poznamka or "Zjištěna neshoda při auditu",
+                    "zavaznost": "medium",
+                    "status": "open",
+                }
+                for answer_id, poznamka in nok_answers
+            ]
+        )
+        .on_conflict_do_nothing(constraint=NESHODA_ANSWER_KEY)
+    )
+
+
 @router.post("/")
 def save_answer(
     audit_execution_id: int = Form(...),
@@ -30,6 +110,32 @@ def save_answer(
     current: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    # Fotka se nejdřív po blocích zapíše do dočasného souboru. Spojení,
+    # které session držela kvůli ověření tokenu, se zatím vrátí do poolu.
+    staged = None
+    if picture:
+        db.close()
+        staged = stage_upload(picture)
+
+    try:
+        return _store_answer(
+            db, current, audit_execution_id, question_id, odpoved, has_issue, poznamka, staged
+        )
+    finally:
+        if staged:
+            staged.discard()  # po úspěšném uložení už dočasný soubor neexistuje
+
+
+def _store_answer(
+    db: Session,
+    current: User,
+    audit_execution_id: int,
+    question_id: int,
+    odpoved: str,
+    has_issue: bool,
+    poznamka: str | None,
+    staged: StagedUpload | None,
+):
 
     # --- VALIDACE ---
 
@@ -62,68 +168,270 @@ def save_answer(
 
     # --- ULOŽENÍ ODPOVĚDI (UPSERT = insert nebo update) ---
 
-    existing = (
-        db.query(AuditAnswer)
+    values = {"odpoved": odpoved_norm, "has_issue": has_issue}
+
+    #-----Přidání fotky--------
+
+    if staged:
+        values.update(store_photo(db, staged))
+
+    answer_id, old_odpoved, inserted = _upsert_answer(db, audit_execution_id, question_id, values)
+
+    stats_rollup.record_answer(
+        db,
+        execution.assignment_id,
+        question.category_id,
+        old_odpoved,
+        odpoved_norm,
+    )
+
+    # Počitadla na execution (atomicky v SQL, bez čtení všech odpovědí)
+    deltas = stats_rollup.answer_deltas(old_odpoved, odpoved_norm)
+    execution.ok_count = AuditExecution.ok_count + deltas["ok_count"]
+    execution.nok_count = AuditExecution.nok_count + deltas["nok_count"]
+    if inserted:
+        execution.total_count = AuditExecution.total_count + 1
+
+    # --- AUTOMATICKÁ NESHODA PŘI NOK ---
+
+    if odpoved_norm == "NOK":
+        _open_neshody(db, audit_execution_id, [(answer_id, poznamka)])
+
+    db.commit()
+    dashboard_cache.invalidate()
+    _evict_neshoda_details(audit_execution_id)
+
+    if "picture_url" in values:
+        photo_derivatives.schedule_derivatives([values["picture_url"]])
+
+    return {"message": "Odpověď uložena"}
+
+# ========== HROMADNÉ ULOŽENÍ CELÉHO CHECKLISTU ==========
+
+class BatchAnswerItem(BaseModel):
+    question_id: int
+    odpoved: str  # "OK" / "NOK"
+    has_issue: bool = False
+    poznamka: Optional[str] = None
+    picture_index: Optional[int] = None  # index do pole `pictures`
+
+
+def _parse_batch_answers(raw: str) -> list[BatchAnswerItem]:
+    try:
+        items = [BatchAnswerItem(**item) for item in json.loads(raw)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Neplatný formát pole 'answers'")
+
+    for item in items:
+        item.odpoved = item.odpoved.strip().upper()
+        if item.odpoved not in ["OK", "NOK"]:
+            raise HTTPException(
+                status_code=400,
+                detail="Odpověď musí být 'OK' nebo 'NOK'",
+            )
+
+    return items
+
+
+@router.post("/batch")
+def save_answers_batch(
+    audit_execution_id: int = Form(...),
+    answers: str = Form(..., description="JSON pole odpovědí (BatchAnswerItem)"),
+    pictures: list[UploadFile] | None = File(None),
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Uloží odpovědi na celý checklist jedním requestem a v jedné transakci.
+    Fotky se posílají v `pictures`, odpověď na ně ukazuje přes picture_index.
+    """
+    items = _parse_batch_answers(answers)
+    if not items:
+        raise HTTPException(status_code=400, detail="Žádné odpovědi k uložení")
+
+    pictures = pictures or []
+
+    picture_indexes = [i.picture_index for i in items if i.picture_index is not None]
+    if len(set(picture_indexes)) != len(picture_indexes):
+        raise HTTPException(status_code=400, detail="Jedna fotka je u více odpovědí")
+
+    for item in items:
+        if item.picture_index is not None and not (
+            0 <= item.picture_index < len(pictures)
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Neplatný picture_index u otázky {item.question_id}",
+            )
+
+    # Fotky nejdřív do dočasných souborů, bez držení DB spojení
+    staged = []
+    if pictures:
+        db.close()
+
+    try:
+        for picture in pictures:
+            staged.append(stage_upload(picture))
+
+        return _store_answers_batch(db, current, audit_execution_id, items, staged)
+    finally:
+        for upload in staged:
+            upload.discard()
+
+
+def _store_answers_batch(
+    db: Session,
+    current: User,
+    audit_execution_id: int,
+    items: list[BatchAnswerItem],
+    staged: list[StagedUpload],
+):
+
+    # --- VALIDACE ---
+
+    row = (
+        db.query(AuditExecution, LpaAssignment.template_id)
+        .join(LpaAssignment, AuditExecution.assignment_id == LpaAssignment.id)
+        .filter(AuditExecution.id == audit_execution_id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Audit nenalezen")
+
+    execution, template_id = row
+
+    if execution.auditor_id != current.id and current.role != "admin":
+        raise HTTPException(status_code=403, detail="Nemůžeš zapisovat cizí audit")
+
+    question_ids = [item.question_id for item in items]
+    if len(set(question_ids)) != len(question_ids):
+        raise HTTPException(status_code=400, detail="Otázka je v dávce vícekrát")
+
+    # Otázky šablony jedním dotazem (id -> kategorie)
+    question_categories = dict(
+        db.query(ChecklistQuestion.id, ChecklistQuestion.category_id)
         .filter(
-            AuditAnswer.audit_execution_id == audit_execution_id,
-            AuditAnswer.question_id == question_id,
+            ChecklistQuestion.template_id == template_id,
+            ChecklistQuestion.id.in_(question_ids),
         )
-        .first()
+        .all()
     )
+    unknown = [q for q in question_ids if q not in question_categories]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Otázky nepatří do checklistu auditu: {unknown}",
+        )
 
-    if existing:
-        existing.odpoved = odpoved_norm
-        existing.has_issue = has_issue
-        existing.picture_url = existing.picture_url  # zatím beze změny
-    else:
-        ans = AuditAnswer(
-            audit_execution_id=audit_execution_id,
-            question_id=question_id,
-            odpoved=odpoved_norm,
-            has_issue=has_issue,
+    # --- ULOŽENÍ (jedna transakce) ---
+
+    answers_table = AuditAnswer.__table__
+
+    def lock_existing(ids):
+        """Existující odpovědi zamčené pro update: question_id -> (id, odpoved)"""
+        rows = db.execute(
+            select(answers_table.c.question_id, answers_table.c.id, answers_table.c.odpoved)
+            .where(
+                answers_table.c.audit_execution_id == audit_execution_id,
+                answers_table.c.question_id.in_(ids),
+            )
+            .with_for_update()
         )
-        db.add(ans)
+        return {question_id: (answer_id, old) for question_id, answer_id, old in rows}
 
-    # --- AUTOMATICKÁ NESHODA PŘI NOK ---
+    existing = lock_existing(question_ids)
 
-    if odpoved_norm == "NOK":
-        neshoda = Neshoda(
-            audit_execution_id=audit_execution_id,
-            popis=poznamka or "Zjištěna neshoda při auditu",
-            zavaznost="medium",
-            status="open",
+    photos = {
+        item.question_id: store_photo(db, staged[item.picture_index])
+        for item in items
+        if item.picture_index is not None
+    }
+
+    def answer_values(item):
+        values = {"odpoved": item.odpoved, "has_issue": item.has_issue}
+        values.update(photos.get(item.question_id, {}))
+        return values
+
+    # Nové odpovědi jedním INSERT … ON CONFLICT DO NOTHING
+    new_items = [item for item in items if item.question_id not in existing]
+    inserted = {}
+    if new_items:
+        inserted = dict(
+            db.execute(
+                insert(answers_table)
+                .values(
+                    [
+                        {
+                            "audit_execution_id": audit_execution_id,
+                            "question_id": item.question_id,
+                            "picture_url": None,
+                            "photo_id": None,
+                            **answer_values(item),
+                        }
+                        for item in new_items
+                    ]
+                )
+                .on_conflict_do_nothing(constraint=ANSWER_KEY)
+                .returning(answers_table.c.question_id, answers_table.c.id)
+            ).all()
         )
-        db.add(neshoda)
 
-    #-----Přidání fotky--------
-   
-    picture_path = None
+    # Souběžně vložené odpovědi (konflikt) se přepíšou jako existující
+    conflicted = [item.question_id for item in new_items if item.question_id not in inserted]
+    if conflicted:
+        existing.update(lock_existing(conflicted))
 
-    if picture:
-        import os
-        from uuid import uuid4
+    updated_rows = [
+        {"id": existing[item.question_id][0], **answer_values(item)}
+        for item in items
+        if item.question_id not in inserted
+    ]
+    db.bulk_update_mappings(AuditAnswer, updated_rows)
 
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
+    changes = [
+        (
+            question_categories[item.question_id],
+            None if item.question_id in inserted else existing[item.question_id][1],
+            item.odpoved,
+        )
+        for item in items
+    ]
 
-        date_str = datetime.utcnow().strftime("%Y%m%d")
-        filename = f"{date_str}_{audit_execution_id}_{question_id}_01{os.path.splitext(picture.filename)[1]}"
-        file_path = os.path.join(upload_dir, filename)      
+    # Automatická neshoda při NOK (stejně jako save_answer)
+    _open_neshody(
+        db,
+        audit_execution_id,
+        [
+            (inserted.get(item.question_id) or existing[item.question_id][0], item.poznamka)
+            for item in items
+            if item.odpoved == "NOK"
+        ],
+    )
 
-        with open(file_path, "wb") as f:
-            f.write(picture.file.read())
+    stats_rollup.record_answers(db, execution.assignment_id, changes)
 
-        picture_path = file_path
+    deltas = {"ok_count": 0, "nok_count": 0}
+    for _, old_odpoved, new_odpoved in changes:
+        for column, delta in stats_rollup.answer_deltas(old_odpoved, new_odpoved).items():
+            deltas[column] += delta
 
-    # Uložíme cestu k fotce do odpovědi
-        if existing:
-            existing.picture_url = picture_path
-        else:
-            ans.picture_url = picture_path
+    execution.ok_count = AuditExecution.ok_count + deltas["ok_count"]
+    execution.nok_count = AuditExecution.nok_count + deltas["nok_count"]
+    execution.total_count = AuditExecution.total_count + len(inserted)
 
     db.commit()
+    dashboard_cache.invalidate()
+    _evict_neshoda_details(audit_execution_id)
+
+    photo_derivatives.schedule_derivatives(p["picture_url"] for p in photos.values())
+
+    return {
+        "message": "Odpovědi uloženy",
+        "saved": len(items),
+        "created": len(inserted),
+        "updated": len(updated_rows),
+    }
 
-    return {"message": "Odpověď uložena"}
 
 @router.get("/summary/{audit_execution_id}")
 def audit_summary(
@@ -156,6 +464,7 @@ def audit_summary(
         {
             "question_id": a.question_id,
             "picture_url": a.picture_url,
+            **photo_derivatives.photo_urls(a.picture_url),
         }
         for a in answers
         if a.odpoved == "NOK"
@@ -172,18 +481,14 @@ def audit_summary(
 
 # ========== NOVÉ ENDPOINTY PRO NOK AUDITY ==========
 
-@router.get("/nok-list")
-def get_nok_answers(
+def _nok_query(
+    db: Session,
     line_id: Optional[int] = None,
     category_id: Optional[int] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    current: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
-    """
-    Vrátí seznam všech NOK odpovědí s detaily včetně fotek a komentářů
-    """
+    """Dotaz na NOK odpovědi s filtry (bez řazení)"""
     query = (
         db.query(
             AuditAnswer,
@@ -203,7 +508,7 @@ def get_nok_answers(
         .join(ChecklistCategory, LpaAssignment.category_id == ChecklistCategory.id)
         .join(LpaCampaign, LpaAssignment.campaign_id == LpaCampaign.id)
         .join(User, AuditExecution.auditor_id == User.id)
-        .outerjoin(Neshoda, Neshoda.audit_execution_id == AuditExecution.id)
+        .outerjoin(Neshoda, Neshoda.answer_id == AuditAnswer.id)
         .filter(AuditAnswer.odpoved == "NOK")
     )
 
@@ -220,6 +525,23 @@ def get_nok_answers(
     if date_to:
         query = query.filter(AuditExecution.started_at <= date_to)
 
+    return query
+
+
+@router.get("/nok-list")
+def get_nok_answers(
+    line_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Vrátí seznam všech NOK odpovědí s detaily včetně fotek a komentářů
+    """
+    query = _nok_query(db, line_id, category_id, date_from, date_to)
+
     results = query.order_by(AuditExecution.started_at.desc()).all()
 
     return [
@@ -227,6 +549,7 @@ def get_nok_answers(
             "id": answer.id,
             "question_text": question_text,
             "picture_url": answer.picture_url,
+            **photo_derivatives.photo_urls(answer.picture_url),
             "execution_id": execution.id,
             "execution_date": execution.started_at.date() if execution.started_at else None,
             "line_name": line_name,
@@ -243,6 +566,55 @@ def get_nok_answers(
     ]
 
 
+NOK_EXPORT_COLUMNS = [
+    "ID odpovědi", "ID auditu", "Datum", "Měsíc", "Linka", "Kategorie", "Auditor",
+    "Otázka", "ID neshody", "Stav neshody", "Popis neshody", "Termín", "Fotka",
+]
+
+
+def _nok_export_row(answer, question_text, execution, assignment, line_name, category_name, month, auditor_name, neshoda):
+    return [
+        answer.id,
+        execution.id,
+        execution.started_at.date() if execution.started_at else None,
+        month,
+        line_name,
+        category_name,
+        auditor_name,
+        question_text,
+        neshoda.id if neshoda else None,
+        neshoda.status if neshoda else None,
+        neshoda.popis if neshoda else None,
+        neshoda.termin if neshoda else None,
+        answer.picture_url,
+    ]
+
+
+@router.get("/nok-list/export")
+def export_nok_answers(
+    format: str = Query("csv", description="csv nebo xlsx"),
+    line_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current: User = Depends(get_current_user),
+):
+    """Export NOK odpovědí (stejné filtry jako /nok-list), streamovaný po dávkách"""
+
+    def build_query(db: Session):
+        return _nok_query(db, line_id, category_id, date_from, date_to).order_by(
+            AuditExecution.started_at.desc(), AuditAnswer.id.desc()
+        )
+
+    return export_response(
+        format,
+        filename_stem="nok_odpovedi",
+        sheet_title="NOK odpovědi",
+        columns=NOK_EXPORT_COLUMNS,
+        rows=iter_query_rows(build_query, _nok_export_row),
+    )
+
+
 @router.get("/execution/{execution_id}")
 def get_execution_answers(
     execution_id: int,
@@ -274,6 +646,7 @@ def get_execution_answers(
             "category": category_name,
             "odpoved": answer.odpoved,
             "picture_url": answer.picture_url,
+            **photo_derivatives.photo_urls(answer.picture_url),
             "has_issue": answer.has_issue,
         }
         for answer, question_text, position, category_name in answers
@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from datetime import date, timedelta
@@ -15,6 +17,11 @@ from ..models import (
     AuditAnswer,
     ChecklistQuestion,
 )
+from .. import photo_derivatives, report_pdf
+from ..assignment_generation import (
+    assignments_exist,
+    generate_assignments as generate_campaign_assignments,
+)
 
 router = APIRouter()
 
@@ -38,7 +45,7 @@ def create_assignment(
 
     # Kontrola auditora
     auditor = db.query(User).filter(User.id == auditor_id).first()
-    if not auditor or auditor.role != "auditor":
+    if not auditor or not auditor.has_role("auditor"):
         raise HTTPException(status_code=400, detail="Neplatný auditor")
 
     # Kontrola linky
@@ -98,7 +105,7 @@ def list_assignments(
     )
 
     # Auditor vidí jen svá přidělení
-    if current.role == "auditor":
+    if current.has_role("auditor") and not current.has_role("admin"):
         q = q.filter(LpaAssignment.auditor_id == current.id)
 
     results = q.all()
@@ -129,7 +136,7 @@ def get_assignment(
     if not assignment:
         raise HTTPException(status_code=404, detail="Přidělení nenalezeno")
 
-    if current.role == "auditor" and assignment.auditor_id != current.id:
+    if current.has_role("auditor") and not current.has_role("admin") and assignment.auditor_id != current.id:
         raise HTTPException(status_code=403, detail="Toto přidělení není tvoje")
 
     return assignment
@@ -148,74 +155,32 @@ def generate_assignments(
     if not campaign:
         raise HTTPException(status_code=404, detail="Kampaň pro tento měsíc neexistuje")
 
-    auditors = db.query(User).filter_by(role="auditor").all()
-    if not auditors:
-        raise HTTPException(status_code=400, detail="Neexistují žádní auditoři")
-
-    lines = db.query(Line).all()
-    if not lines:
-        raise HTTPException(status_code=400, detail="Neexistují žádné linky")
-
-    existing = (
-        db.query(LpaAssignment).filter(LpaAssignment.campaign_id == campaign.id).first()
-    )
-    if existing:
+    if assignments_exist(db, campaign.id):
         raise HTTPException(
             status_code=400, detail="Přidělení pro tuto kampaň už byla vygenerována"
         )
 
-    assignments = []
-    auditor_index = 0
-
-    for line in lines:
-        auditor = auditors[auditor_index % len(auditors)]
-        auditor_index += 1
-
-        template = (
-            db.query(ChecklistTemplate)
-            .filter(ChecklistTemplate.line_id == line.id)
-            .first()
-        )
-
-        if not template:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Neexistuje checklist šablona pro linku {line.name}",
-            )
-
-        assignment = LpaAssignment(
-            campaign_id=campaign.id,
-            auditor_id=auditor.id,
-            line_id=line.id,
-            template_id=template.id,
-            termin=date.fromisoformat(f"{month}-28"),
-            status="pending",
-        )
-
-        db.add(assignment)
-        assignments.append(
-            {
-                "line": line.name,
-                "auditor": auditor.jmeno,
-                "template_id": template.id,
-            }
-        )
+    termin_date = date.fromisoformat(f"{month}-28")
+    generated = generate_campaign_assignments(db, campaign, lambda: termin_date)
 
     campaign.status = "generated"
     db.commit()
 
     return {
         "message": "Assignments generated",
-        "assignments": assignments,
+        "assignments": [
+            {
+                "line": a.line_name,
+                "auditor": a.auditor_name,
+                "template_id": a.template_id,
+            }
+            for a in generated
+        ],
     }
 
 
-@router.get("/{assignment_id}/report")
-def get_assignment_report(
-    assignment_id: int,
-    current: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
+def _load_report(db: Session, current: User, assignment_id: int):
+    """Data reportu přidělení (poslední execution + odpovědi). Vrací (report, execution)."""
     # 1) Najdeme assignment + navázané věci přes JOIN
     assignment_data = (
         db.query(
@@ -223,10 +188,12 @@ def get_assignment_report(
             LpaCampaign.month.label("campaign_month"),
             Line.name.label("line_name"),
             ChecklistCategory.name.label("category_name"),
+            User.jmeno.label("auditor_name"),
         )
         .join(LpaCampaign, LpaAssignment.campaign_id == LpaCampaign.id)
         .join(Line, LpaAssignment.line_id == Line.id)
         .join(ChecklistCategory, LpaAssignment.category_id == ChecklistCategory.id)
+        .outerjoin(User, LpaAssignment.auditor_id == User.id)
         .filter(LpaAssignment.id == assignment_id)
         .first()
     )
@@ -234,10 +201,10 @@ def get_assignment_report(
     if not assignment_data:
         raise HTTPException(status_code=404, detail="Přidělení nenalezeno")
 
-    assignment, month, line_name, category_name = assignment_data
+    assignment, month, line_name, category_name, auditor_name = assignment_data
 
     # 2) Bezpečnost: auditor jen své
-    if current.role == "auditor" and assignment.auditor_id != current.id:
+    if current.has_role("auditor") and not current.has_role("admin") and assignment.auditor_id != current.id:
         raise HTTPException(status_code=403, detail="Toto není tvůj audit")
 
     # 3) Najdeme poslední execution pro tento assignment
@@ -270,16 +237,23 @@ def get_assignment_report(
         .all()
     )
 
-    return {
+    report = {
         "assignment": {
             "id": assignment.id,
             "status": assignment.status,
             "termin": assignment.termin,
             "datum_provedeni": assignment.datum_provedeni,
         },
+        "execution": {
+            "id": execution.id,
+            "status": execution.status,
+            "started_at": execution.started_at,
+            "finished_at": execution.finished_at,
+        },
         "campaign_month": month,
         "line": line_name,
         "category": category_name,
+        "auditor": auditor_name,
         "answers": [
             {
                 "question_id": a.question_id,
@@ -288,10 +262,50 @@ def get_assignment_report(
                 "category": a.category_name,
                 "odpoved": a.odpoved,
                 "picture_url": a.picture_url,
+                **photo_derivatives.photo_urls(a.picture_url),
             }
             for a in answers
         ],
     }
+    return report, execution
+
+
+@router.get("/{assignment_id}/report")
+def get_assignment_report(
+    assignment_id: int,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    report, _ = _load_report(db, current, assignment_id)
+    return report
+
+
+@router.get("/{assignment_id}/report/pdf")
+async def get_assignment_report_pdf(
+    assignment_id: int,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    PDF report dokončeného auditu. Vykresluje se v process poolu
+    a cachuje na disku, dokud se nezmění odpovědi.
+    """
+    if not report_pdf.is_available():
+        raise HTTPException(status_code=501, detail="PDF report vyžaduje reportlab")
+
+    # DB je synchronní – mimo event loop
+    report, execution = await run_in_threadpool(_load_report, db, current, assignment_id)
+
+    if execution.status != "done":
+        raise HTTPException(status_code=400, detail="Audit ještě není dokončen")
+
+    path = await report_pdf.get_or_render(execution.id, report)
+
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        filename=f"lpa_audit_{assignment_id}.pdf",
+    )
 
 
 @router.post("/{assignment_id}/set-status")
@@ -367,7 +381,7 @@ def get_allocations_by_month(
     from datetime import date
 
     # Kontrola práv - pouze admin a auditor
-    if current.role not in ["admin", "auditor"]:
+    if not (current.has_role("admin") or current.has_role("auditor")):
         raise HTTPException(403, "Nemáte oprávnění k zobrazení rozlosování")
 
     results = (
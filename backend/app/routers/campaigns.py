@@ -4,15 +4,13 @@ from datetime import date, timedelta
 import random
 
 from ..auth import get_db, get_current_user
-from ..models import (
-    User,
-    LpaCampaign,
-    LpaAssignment,
-    Line,
-    ChecklistTemplate,
-    ChecklistCategory,
+from ..models import User, LpaCampaign
+from .. import outbox
+from ..assignment_generation import (
+    assignments_exist,
+    generate_assignments as generate_campaign_assignments,
+    queue_assignment_emails,
 )
-from ..email_service import send_audit_assignment_email
 
 
 router = APIRouter()
@@ -83,7 +81,10 @@ def generate_assignments(
     current: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Generuje přidělení auditů a odesílá emailové notifikace auditorům"""
+    """
+    Generuje přidělení auditů a zařadí emailové notifikace auditorům do outboxu
+    (jeden souhrnný email na auditora, pokud nechce email ke každému auditu)
+    """
     if current.role != "admin":
         raise HTTPException(status_code=403, detail="Only admin")
 
@@ -102,100 +103,34 @@ def generate_assignments(
     if not campaign:
         raise HTTPException(404, f"Kampaň pro {campaign_month} neexistuje")
 
-    # 2) Auditoři
-    auditors = db.query(User).filter_by(role="auditor").all()
-    if not auditors:
-        raise HTTPException(400, "Neexistují žádní auditoři")
-
-    # 3) Linky
-    lines = db.query(Line).all()
-    if not lines:
-        raise HTTPException(400, "Neexistují žádné linky")
-
-    # 4) Kategorie
-    categories = db.query(ChecklistCategory).all()
-    if not categories:
-        raise HTTPException(400, "Neexistují žádné checklist kategorie")
-
-    # 5) Zabránit dvojímu generování
-    existing = (
-        db.query(LpaAssignment).filter(LpaAssignment.campaign_id == campaign.id).first()
-    )
-    if existing:
+    # 2) Zabránit dvojímu generování
+    if assignments_exist(db, campaign.id):
         raise HTTPException(400, "Přidělení pro tuto kampaň už byla vygenerována")
 
-    assignments = []
-    auditor_index = 0
-    category_index = 0
-    emails_sent = 0
-    emails_failed = 0
-
-    for line in lines:
-        auditor = auditors[auditor_index % len(auditors)]
-        auditor_index += 1
+    # 3) Přidělení jedním hromadným insertem
+    termin_date = date.fromisoformat(f"{campaign_month}-28")
+    generated = generate_campaign_assignments(db, campaign, lambda: termin_date)
 
-        category = categories[category_index % len(categories)]
-        category_index += 1
-
-        template = (
-            db.query(ChecklistTemplate)
-            .filter(ChecklistTemplate.line_id == line.id)
-            .first()
-        )
-
-        if not template:
-            raise HTTPException(
-                400, f"Neexistuje checklist šablona pro linku {line.name}"
-            )
-
-        # ✅ OPRAVA - vytvoření termínu jako date objekt
-        termin_date = date.fromisoformat(f"{campaign_month}-28")
-
-        assignment = LpaAssignment(
-            campaign_id=campaign.id,
-            auditor_id=auditor.id,
-            line_id=line.id,
-            template_id=template.id,
-            category_id=category.id,
-            termin=termin_date,  # ✅ date objekt
-            status="pending",
-        )
-
-        db.add(assignment)
-        db.flush()  # Získáme ID assignmentu pro email
-
-        # Odeslání emailu auditorovi
-        if send_emails:
-            try:
-                send_audit_assignment_email(
-                    to_email=auditor.email,
-                    auditor_name=auditor.jmeno,
-                    line_name=line.name,
-                    category_name=category.name,
-                    deadline=termin_date.isoformat(),
-                    assignment_id=assignment.id,
-                )
-                emails_sent += 1
-            except Exception as e:
-                print(f"Chyba při odesílání emailu pro {auditor.email}: {e}")
-                emails_failed += 1
-
-        assignments.append(
-            {
-                "line": line.name,
-                "auditor": auditor.jmeno,
-                "category": category.name,
-            }
-        )
+    # Emaily auditorům – do outboxu ve stejné transakci, odešle worker
+    emails_queued = (
+        queue_assignment_emails(db, campaign_month, generated) if send_emails else 0
+    )
 
     campaign.status = "generated"
     db.commit()
+    outbox.wake()
 
     return {
-        "message": f"Vygenerováno {len(assignments)} přidělení pro {campaign_month}",
-        "assignments": assignments,
-        "emails_sent": emails_sent,
-        "emails_failed": emails_failed,
+        "message": f"Vygenerováno {len(generated)} přidělení pro {campaign_month}",
+        "assignments": [
+            {
+                "line": a.line_name,
+                "auditor": a.auditor_name,
+                "category": a.category_name,
+            }
+            for a in generated
+        ],
+        "emails_queued": emails_queued,
     }
 
 
@@ -231,87 +166,23 @@ def auto_generate_current_month(
         db.refresh(campaign)
 
     # === 2) Pokud už přidělení existují → stop ===
-    existing = (
-        db.query(LpaAssignment).filter(LpaAssignment.campaign_id == campaign.id).first()
-    )
-
-    if existing:
+    if assignments_exist(db, campaign.id):
         return {"message": f"Přidělení pro {month} už existují — nic nebylo změněno."}
 
-    # === 3) Načteme auditory, linky a kategorie ===
-    auditors = db.query(User).filter(User.role == "auditor").all()
-    if not auditors:
-        raise HTTPException(400, "Neexistují žádní auditoři")
-
-    lines = db.query(Line).all()
-    if not lines:
-        raise HTTPException(400, "Neexistují žádné linky")
-
-    categories = db.query(ChecklistCategory).all()
-    if not categories:
-        raise HTTPException(400, "Neexistují žádné checklist kategorie")
-
-    assignments_count = 0
-    auditor_index = 0
-    category_index = 0
-    emails_sent = 0
-    emails_failed = 0
-
-    for line in lines:
-        auditor = auditors[auditor_index % len(auditors)]
-        auditor_index += 1
-
-        category = categories[category_index % len(categories)]
-        category_index += 1
-
-        template = (
-            db.query(ChecklistTemplate)
-            .filter(ChecklistTemplate.line_id == line.id)
-            .first()
-        )
-
-        if not template:
-            raise HTTPException(
-                400,
-                f"Neexistuje checklist šablona pro linku {line.name}",
-            )
-
-        assignment = LpaAssignment(
-            campaign_id=campaign.id,
-            auditor_id=auditor.id,
-            line_id=line.id,
-            category_id=category.id,  # ✅ TEĎ UŽ JE DEFINOVANÁ
-            template_id=template.id,
-            termin=random_deadline_from(today),
-            status="pending",  # ✅ NOVÉ PŘIDĚLENÍ = pending
-        )
+    # === 3) Přidělení jedním hromadným insertem ===
+    generated = generate_campaign_assignments(
+        db, campaign, lambda: random_deadline_from(today)
+    )
 
-        db.add(assignment)
-        db.flush()  # Získáme ID assignmentu pro email
-        assignments_count += 1
-
-        # Odeslání emailu auditorovi
-        if send_emails:
-            try:
-                send_audit_assignment_email(
-                    to_email=auditor.email,
-                    auditor_name=auditor.jmeno,
-                    line_name=line.name,
-                    category_name=category.name,
-                    deadline=assignment.termin.isoformat(),
-                    assignment_id=assignment.id,
-                )
-                emails_sent += 1
-            except Exception as e:
-                print(f"Chyba při odesílání emailu pro {auditor.email}: {e}")
-                emails_failed += 1
+    # Emaily auditorům – do outboxu ve stejné transakci, odešle worker
+    emails_queued = queue_assignment_emails(db, month, generated) if send_emails else 0
 
     campaign.status = "generated"
     db.commit()
+    outbox.wake()
 
     return {
-        "message": f"Vygenerováno {assignments_count} přidělení pro {month}",
-        "assignments_count": assignments_count,
-        "emails_sent": emails_sent,
-        "emails_failed": emails_failed,
+        "message": f"Vygenerováno {len(generated)} přidělení pro {month}",
+        "assignments_count": len(generated),
+        "emails_queued": emails_queued,
     }
@@ -1,19 +1,21 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import date, timedelta
-from collections import defaultdict
-
+from datetime import date
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 
 from ..auth import get_db, get_current_user
+from ..database import SessionLocal
+from ..cache import dashboard_cache
 from ..models import (
     AuditAnswer,
     AuditExecution,
+    AuditStatsMonthly,
     LpaAssignment,
     LpaCampaign,
     Line,
     ChecklistCategory,
-    ChecklistQuestion,
     User,
 )
 
@@ -28,6 +30,10 @@ def get_kpi(
     current=Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    return dashboard_cache.get_or_set("kpi", lambda: _compute_kpi(db))
+
+
+def _compute_kpi(db: Session):
     # Celkem auditů (dokončených)
     audits_count = (
         db.query(AuditExecution).filter(AuditExecution.status == "done").count()
@@ -57,6 +63,10 @@ def get_last_audits(
     current=Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    return dashboard_cache.get_or_set("last-audits", lambda: _compute_last_audits(db))
+
+
+def _compute_last_audits(db: Session):
     # Posledních 5 auditů (podle času zahájení)
     executions = (
         db.query(
@@ -88,45 +98,88 @@ def get_last_audits(
     return result
 
 
-# --- Pro graf --
-@router.get("/stats/monthly-audits")
-def get_monthly_audits(
-    months: int = 6,
-    current=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Graf: Počet provedených auditů za posledních X měsíců"""
-    today = date.today()
+def _success_rate(ok: int, nok: int) -> float:
+    total = ok + nok
+    return round((ok / total * 100), 1) if total > 0 else 0
+
+
+# ==============================
+# MĚSÍČNÍ ČASOVÁ ŘADA
+# ==============================
+def _parse_month(value: str) -> date:
+    """'2026-03' -> date(2026, 3, 1)"""
+    try:
+        year, month = value.split("-")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise HTTPException(400, f"Neplatný měsíc '{value}', očekáváno YYYY-MM")
+
+
+def _shift_month(month_date: date, delta: int) -> date:
+    index = month_date.year * 12 + (month_date.month - 1) + delta
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _resolve_month_range(
+    months: int, month_from: Optional[str], month_to: Optional[str]
+) -> list[date]:
+    """Vrátí seznam prvních dnů kalendářních měsíců v rozsahu (včetně)"""
+    end = _parse_month(month_to) if month_to else date.today().replace(day=1)
+    start = _parse_month(month_from) if month_from else _shift_month(end, -(months - 1))
+
+    if start > end:
+        raise HTTPException(400, "Parametr 'from' musí být před 'to'")
+
     result = []
+    current_month = start
+    while current_month <= end:
+        result.append(current_month)
+        current_month = _shift_month(current_month, 1)
+    return result
 
-    for i in range(months - 1, -1, -1):
-        month_date = today.replace(day=1) - timedelta(days=30 * i)
-        month_str = month_date.strftime("%Y-%m")
 
-        # Spočítej audity pro tento měsíc
-        campaigns = (
-            db.query(LpaCampaign.id).filter(LpaCampaign.month == month_str).subquery()
-        )
+def _monthly_series(db: Session, month_dates: list[date]) -> dict:
+    """
+    Jedním GROUP BY nad rollupem (audit_stats_monthly) spočítá audity
+    a OK/NOK odpovědi pro celý rozsah měsíců. Měsíce bez dat v dotazu chybí.
+    """
+    if not month_dates:
+        return {}
 
-        completed = (
-            db.query(AuditExecution)
-            .join(LpaAssignment, LpaAssignment.id == AuditExecution.assignment_id)
-            .filter(
-                LpaAssignment.campaign_id.in_(campaigns),
-                AuditExecution.status == "done",
-            )
-            .count()
-        )
+    month_from = month_dates[0].strftime("%Y-%m")
+    month_to = month_dates[-1].strftime("%Y-%m")
 
-        in_progress = (
-            db.query(AuditExecution)
-            .join(LpaAssignment, LpaAssignment.id == AuditExecution.assignment_id)
-            .filter(
-                LpaAssignment.campaign_id.in_(campaigns),
-                AuditExecution.status == "in_progress",
-            )
-            .count()
+    rows = (
+        db.query(
+            AuditStatsMonthly.month.label("month"),
+            func.sum(AuditStatsMonthly.done_count).label("completed"),
+            func.sum(
+                AuditStatsMonthly.executions_count - AuditStatsMonthly.done_count
+            ).label("in_progress"),
+            func.sum(AuditStatsMonthly.ok_count).label("ok_count"),
+            func.sum(AuditStatsMonthly.nok_count).label("nok_count"),
         )
+        .filter(
+            AuditStatsMonthly.month >= month_from,
+            AuditStatsMonthly.month <= month_to,
+        )
+        .group_by(AuditStatsMonthly.month)
+        .all()
+    )
+
+    return {r.month: r for r in rows}
+
+
+def _stats_monthly_audits(db: Session, month_dates: list[date], series=None):
+    if series is None:
+        series = _monthly_series(db, month_dates)
+
+    result = []
+    for month_date in month_dates:
+        month_str = month_date.strftime("%Y-%m")
+        row = series.get(month_str)
+        completed = row.completed if row else 0
+        in_progress = row.in_progress if row else 0
 
         result.append(
             {
@@ -141,208 +194,101 @@ def get_monthly_audits(
     return result
 
 
-@router.get("/stats/success-rate-trend")
-def get_success_rate_trend(
-    months: int = 6,
-    current=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Graf: Trend úspěšnosti (% OK odpovědí) v čase"""
-    today = date.today()
-    result = []
+def _stats_success_rate_trend(db: Session, month_dates: list[date], series=None):
+    if series is None:
+        series = _monthly_series(db, month_dates)
 
-    for i in range(months - 1, -1, -1):
-        month_date = today.replace(day=1) - timedelta(days=30 * i)
+    result = []
+    for month_date in month_dates:
         month_str = month_date.strftime("%Y-%m")
-
-        # Najdi všechny executiony pro tento měsíc
-        campaigns = (
-            db.query(LpaCampaign.id).filter(LpaCampaign.month == month_str).subquery()
-        )
-
-        executions = (
-            db.query(AuditExecution.id)
-            .join(LpaAssignment, LpaAssignment.id == AuditExecution.assignment_id)
-            .filter(LpaAssignment.campaign_id.in_(campaigns))
-            .subquery()
-        )
-
-        ok_count = (
-            db.query(AuditAnswer)
-            .filter(
-                AuditAnswer.audit_execution_id.in_(executions),
-                AuditAnswer.odpoved == "OK",
-            )
-            .count()
-        )
-
-        nok_count = (
-            db.query(AuditAnswer)
-            .filter(
-                AuditAnswer.audit_execution_id.in_(executions),
-                AuditAnswer.odpoved == "NOK",
-            )
-            .count()
-        )
-
-        total = ok_count + nok_count
-        success_rate = round((ok_count / total * 100), 1) if total > 0 else 0
+        row = series.get(month_str)
+        ok_count = row.ok_count if row else 0
+        nok_count = row.nok_count if row else 0
 
         result.append(
             {
                 "month": month_str,
                 "month_label": month_date.strftime("%b %Y"),
-                "success_rate": success_rate,
+                "success_rate": _success_rate(ok_count, nok_count),
                 "ok": ok_count,
                 "nok": nok_count,
-                "total": total,
+                "total": ok_count + nok_count,
             }
         )
 
     return result
 
 
-@router.get("/stats/by-line")
-def get_stats_by_line(
-    current=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Graf: Statistiky podle linek"""
+def _stats_by_line(db: Session):
     lines_data = (
         db.query(
+            Line.id.label("line_id"),
             Line.name.label("line_name"),
-            func.count(AuditExecution.id).label("audit_count"),
+            func.sum(AuditStatsMonthly.done_count).label("audit_count"),
+            func.sum(AuditStatsMonthly.ok_count).label("ok_count"),
+            func.sum(AuditStatsMonthly.nok_count).label("nok_count"),
         )
-        .join(LpaAssignment, LpaAssignment.line_id == Line.id)
-        .join(AuditExecution, AuditExecution.assignment_id == LpaAssignment.id)
-        .filter(AuditExecution.status == "done")
-        .group_by(Line.name)
+        .join(Line, Line.id == AuditStatsMonthly.line_id)
+        .group_by(Line.id, Line.name)
+        .having(func.sum(AuditStatsMonthly.done_count) > 0)
         .all()
     )
 
-    result = []
-    for line_name, audit_count in lines_data:
-        # Spočítej OK/NOK pro tuto linku
-        executions = (
-            db.query(AuditExecution.id)
-            .join(LpaAssignment, LpaAssignment.id == AuditExecution.assignment_id)
-            .join(Line, Line.id == LpaAssignment.line_id)
-            .filter(Line.name == line_name, AuditExecution.status == "done")
-            .subquery()
-        )
-
-        ok_count = (
-            db.query(AuditAnswer)
-            .filter(
-                AuditAnswer.audit_execution_id.in_(executions),
-                AuditAnswer.odpoved == "OK",
-            )
-            .count()
-        )
-
-        nok_count = (
-            db.query(AuditAnswer)
-            .filter(
-                AuditAnswer.audit_execution_id.in_(executions),
-                AuditAnswer.odpoved == "NOK",
-            )
-            .count()
-        )
-
-        total = ok_count + nok_count
-        success_rate = round((ok_count / total * 100), 1) if total > 0 else 0
-
-        result.append(
-            {
-                "line_name": line_name,
-                "audit_count": audit_count,
-                "ok": ok_count,
-                "nok": nok_count,
-                "success_rate": success_rate,
-            }
-        )
+    result = [
+        {
+            "line_id": r.line_id,
+            "line_name": r.line_name,
+            "audit_count": r.audit_count,
+            "ok": r.ok_count,
+            "nok": r.nok_count,
+            "success_rate": _success_rate(r.ok_count, r.nok_count),
+        }
+        for r in lines_data
+    ]
 
     return sorted(result, key=lambda x: x["audit_count"], reverse=True)
 
 
-@router.get("/stats/by-auditor")
-def get_stats_by_auditor(
-    current=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Graf: Statistiky podle auditorů"""
+def _stats_by_auditor(db: Session):
     auditor_data = (
         db.query(
+            User.id.label("auditor_id"),
             User.jmeno.label("auditor_name"),
-            func.count(AuditExecution.id).label("audit_count"),
+            func.sum(AuditStatsMonthly.done_count).label("audit_count"),
+            func.sum(AuditStatsMonthly.ok_count).label("ok_count"),
+            func.sum(AuditStatsMonthly.nok_count).label("nok_count"),
         )
-        .join(LpaAssignment, LpaAssignment.auditor_id == User.id)
-        .join(AuditExecution, AuditExecution.assignment_id == LpaAssignment.id)
-        .filter(AuditExecution.status == "done", User.role == "auditor")
-        .group_by(User.jmeno)
+        .join(User, User.id == AuditStatsMonthly.auditor_id)
+        .filter(User.role_filter("auditor"))
+        .group_by(User.id, User.jmeno)
+        .having(func.sum(AuditStatsMonthly.done_count) > 0)
         .all()
     )
 
-    result = []
-    for auditor_name, audit_count in auditor_data:
-        # Spočítej OK/NOK pro tohoto auditora
-        executions = (
-            db.query(AuditExecution.id)
-            .join(LpaAssignment, LpaAssignment.id == AuditExecution.assignment_id)
-            .join(User, User.id == LpaAssignment.auditor_id)
-            .filter(User.jmeno == auditor_name, AuditExecution.status == "done")
-            .subquery()
-        )
-
-        ok_count = (
-            db.query(AuditAnswer)
-            .filter(
-                AuditAnswer.audit_execution_id.in_(executions),
-                AuditAnswer.odpoved == "OK",
-            )
-            .count()
-        )
-
-        nok_count = (
-            db.query(AuditAnswer)
-            .filter(
-                AuditAnswer.audit_execution_id.in_(executions),
-                AuditAnswer.odpoved == "NOK",
-            )
-            .count()
-        )
-
-        total = ok_count + nok_count
-        success_rate = round((ok_count / total * 100), 1) if total > 0 else 0
-
-        result.append(
-            {
-                "auditor_name": auditor_name,
-                "audit_count": audit_count,
-                "ok": ok_count,
-                "nok": nok_count,
-                "success_rate": success_rate,
-            }
-        )
+    result = [
+        {
+            "auditor_id": r.auditor_id,
+            "auditor_name": r.auditor_name,
+            "audit_count": r.audit_count,
+            "ok": r.ok_count,
+            "nok": r.nok_count,
+            "success_rate": _success_rate(r.ok_count, r.nok_count),
+        }
+        for r in auditor_data
+    ]
 
     return sorted(result, key=lambda x: x["audit_count"], reverse=True)
 
 
-@router.get("/stats/by-category")
-def get_stats_by_category(
-    current=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Graf: NOK podle kategorií"""
+def _stats_by_category(db: Session):
     category_data = (
         db.query(
             ChecklistCategory.name.label("category_name"),
-            func.count(AuditAnswer.id).label("nok_count"),
+            func.sum(AuditStatsMonthly.nok_count).label("nok_count"),
         )
-        .join(ChecklistQuestion, ChecklistQuestion.category_id == ChecklistCategory.id)
-        .join(AuditAnswer, AuditAnswer.question_id == ChecklistQuestion.id)
-        .filter(AuditAnswer.odpoved == "NOK")
-        .group_by(ChecklistCategory.name)
+        .join(ChecklistCategory, ChecklistCategory.id == AuditStatsMonthly.category_id)
+        .group_by(ChecklistCategory.id, ChecklistCategory.name)
+        .having(func.sum(AuditStatsMonthly.nok_count) > 0)
         .all()
     )
 
@@ -353,82 +299,199 @@ def get_stats_by_category(
     return sorted(result, key=lambda x: x["nok_count"], reverse=True)
 
 
-@router.get("/stats/overall")
-def get_overall_statistics(
+def _stats_overall(db: Session):
+    current_month = date.today().strftime("%Y-%m")
+    is_current = AuditStatsMonthly.month == current_month
+
+    totals = db.query(
+        func.coalesce(func.sum(AuditStatsMonthly.done_count), 0).label("done"),
+        func.coalesce(func.sum(AuditStatsMonthly.executions_count), 0).label("total"),
+        func.coalesce(func.sum(AuditStatsMonthly.ok_count), 0).label("ok"),
+        func.coalesce(func.sum(AuditStatsMonthly.nok_count), 0).label("nok"),
+        func.coalesce(
+            func.sum(AuditStatsMonthly.done_count).filter(is_current), 0
+        ).label("recent_done"),
+        func.coalesce(
+            func.sum(AuditStatsMonthly.ok_count).filter(is_current), 0
+        ).label("recent_ok"),
+        func.coalesce(
+            func.sum(AuditStatsMonthly.nok_count).filter(is_current), 0
+        ).label("recent_nok"),
+    ).one()
+
+    return {
+        "total_audits": totals.done,
+        "in_progress": totals.total - totals.done,
+        "total_answers": totals.ok + totals.nok,
+        "ok_count": totals.ok,
+        "nok_count": totals.nok,
+        "success_rate": _success_rate(totals.ok, totals.nok),
+        "recent_month_success_rate": _success_rate(totals.recent_ok, totals.recent_nok),
+        "recent_month_audits": totals.recent_done,
+    }
+
+
+# --- Pro graf --
+@router.get("/stats/monthly-audits")
+def get_monthly_audits(
+    months: int = Query(6, ge=1, le=120),
+    month_from: Optional[str] = Query(None, alias="from"),
+    month_to: Optional[str] = Query(None, alias="to"),
     current=Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Celkové KPI statistiky"""
+    """Graf: Počet provedených auditů za posledních X měsíců (nebo from/to)"""
+    month_dates = _resolve_month_range(months, month_from, month_to)
+    return _stats_monthly_audits(db, month_dates)
 
-    # Celkem dokončených auditů
-    total_audits = (
-        db.query(AuditExecution).filter(AuditExecution.status == "done").count()
-    )
 
-    # Celkem probíhajících
-    in_progress = (
-        db.query(AuditExecution).filter(AuditExecution.status == "in_progress").count()
-    )
+@router.get("/stats/success-rate-trend")
+def get_success_rate_trend(
+    months: int = Query(6, ge=1, le=120),
+    month_from: Optional[str] = Query(None, alias="from"),
+    month_to: Optional[str] = Query(None, alias="to"),
+    current=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Graf: Trend úspěšnosti (% OK odpovědí) v čase"""
+    month_dates = _resolve_month_range(months, month_from, month_to)
+    return _stats_success_rate_trend(db, month_dates)
 
-    # Celkem odpovědí
-    total_answers = db.query(AuditAnswer).count()
 
-    # OK / NOK
-    ok_count = db.query(AuditAnswer).filter(AuditAnswer.odpoved == "OK").count()
+@router.get("/stats/by-line")
+def get_stats_by_line(
+    current=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Graf: Statistiky podle linek (z rollupu, seskupeno podle ID linky)"""
+    return _stats_by_line(db)
 
-    nok_count = db.query(AuditAnswer).filter(AuditAnswer.odpoved == "NOK").count()
 
-    # Úspěšnost
-    success_rate = (
-        round((ok_count / total_answers * 100), 1) if total_answers > 0 else 0
-    )
+@router.get("/stats/by-auditor")
+def get_stats_by_auditor(
+    current=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Graf: Statistiky podle auditorů (z rollupu, seskupeno podle ID, ne podle jména)"""
+    return _stats_by_auditor(db)
 
-    # Průměrná úspěšnost za poslední měsíc
-    today = date.today()
-    month_start = today.replace(day=1)
 
-    recent_executions = (
-        db.query(AuditExecution.id)
-        .filter(
-            AuditExecution.started_at >= month_start, AuditExecution.status == "done"
-        )
-        .subquery()
-    )
+@router.get("/stats/by-category")
+def get_stats_by_category(
+    current=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Graf: NOK podle kategorií (z rollupu)"""
+    return _stats_by_category(db)
 
-    recent_ok = (
-        db.query(AuditAnswer)
-        .filter(
-            AuditAnswer.audit_execution_id.in_(recent_executions),
-            AuditAnswer.odpoved == "OK",
-        )
-        .count()
-    )
 
-    recent_nok = (
-        db.query(AuditAnswer)
-        .filter(
-            AuditAnswer.audit_execution_id.in_(recent_executions),
-            AuditAnswer.odpoved == "NOK",
-        )
-        .count()
+@router.get("/stats/overall")
+def get_overall_statistics(
+    current=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Celkové KPI statistiky (z rollupu)"""
+    return dashboard_cache.get_or_set("stats/overall", lambda: _stats_overall(db))
+
+
+# ==============================
+# GET /dashboard/stats/bundle
+# ==============================
+BUNDLE_SECTIONS = (
+    "overall",
+    "monthly-audits",
+    "success-rate-trend",
+    "by-line",
+    "by-auditor",
+    "by-category",
+)
+
+
+def _compute_section(db: Session, section: str, month_dates: list[date], series=None):
+    if section == "overall":
+        return _stats_overall(db)
+    if section == "monthly-audits":
+        return _stats_monthly_audits(db, month_dates, series)
+    if section == "success-rate-trend":
+        return _stats_success_rate_trend(db, month_dates, series)
+    if section == "by-line":
+        return _stats_by_line(db)
+    if section == "by-auditor":
+        return _stats_by_auditor(db)
+    return _stats_by_category(db)
+
+
+def _compute_section_in_own_session(section: str, month_dates: list[date]):
+    """Pro paralelní běh – každá sekce má vlastní spojení z poolu"""
+    db = SessionLocal()
+    try:
+        return _compute_section(db, section, month_dates)
+    finally:
+        db.close()
+
+
+@router.get("/stats/bundle")
+def get_stats_bundle(
+    sections: Optional[str] = Query(
+        None, description="Čárkou oddělené sekce, výchozí = všechny"
+    ),
+    months: int = Query(6, ge=1, le=120),
+    month_from: Optional[str] = Query(None, alias="from"),
+    month_to: Optional[str] = Query(None, alias="to"),
+    parallel: bool = False,
+    current=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Všechna data pro stránku Statistiky jedním requestem.
+    Klíče odpovědi odpovídají názvům sekcí (= /dashboard/stats/<sekce>).
+    """
+    requested = (
+        [s.strip() for s in sections.split(",") if s.strip()]
+        if sections
+        else list(BUNDLE_SECTIONS)
     )
+    unknown = [s for s in requested if s not in BUNDLE_SECTIONS]
+    if unknown:
+        raise HTTPException(400, f"Neznámé sekce: {', '.join(unknown)}")
 
-    recent_total = recent_ok + recent_nok
-    recent_success_rate = (
-        round((recent_ok / recent_total * 100), 1) if recent_total > 0 else 0
+    month_dates = _resolve_month_range(months, month_from, month_to)
+    cache_key = ("stats/bundle", tuple(requested), month_dates[0], month_dates[-1])
+
+    return dashboard_cache.get_or_set(
+        cache_key, lambda: _compute_bundle(db, requested, month_dates, parallel)
     )
 
+
+def _compute_bundle(db: Session, requested: list[str], month_dates, parallel: bool):
+    if parallel and len(requested) > 1:
+        with ThreadPoolExecutor(max_workers=len(requested)) as pool:
+            futures = {
+                section: pool.submit(
+                    _compute_section_in_own_session, section, month_dates
+                )
+                for section in requested
+            }
+            return {section: f.result() for section, f in futures.items()}
+
+    # Sekvenčně v jedné session; měsíční řada se načte jen jednou
+    series = None
+    if "monthly-audits" in requested or "success-rate-trend" in requested:
+        series = _monthly_series(db, month_dates)
+
     return {
-        "total_audits": total_audits,
-        "in_progress": in_progress,
-        "total_answers": total_answers,
-        "ok_count": ok_count,
-        "nok_count": nok_count,
-        "success_rate": success_rate,
-        "recent_month_success_rate": recent_success_rate,
-        "recent_month_audits": db.query(AuditExecution)
-        .filter(
-            AuditExecution.started_at >= month_start, AuditExecution.status == "done"
-        )
-        .count(),
+        section: _compute_section(db, section, month_dates, series)
+        for section in requested
     }
+
+
+# ==============================
+# GET /dashboard/cache-stats
+# ==============================
+@router.get("/cache-stats")
+def get_cache_stats(current=Depends(get_current_user)):
+    """Hit/miss počitadla cache dashboardu"""
+    if current.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admin")
+
+    return dashboard_cache.stats()
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, tuple_
 from datetime import datetime, date
 from typing import Optional
+import base64
 
 from ..auth import get_db, get_current_user
 from ..models import (
@@ -12,8 +13,10 @@ from ..models import (
     Line,
     ChecklistCategory,
     LpaCampaign,
-    AuditAnswer,
 )
+from .. import stats_rollup
+from ..cache import dashboard_cache
+from ..exports import export_response, iter_query_rows
 
 router = APIRouter()
 
@@ -31,17 +34,17 @@ def start_audit(
     if not assignment:
         raise HTTPException(status_code=404, detail="Přidělení nenalezeno")
 
-    # 2) Ověř oprávnění
-    if current.role == "auditor" and assignment.auditor_id != current.id:
+    # 2) Ověř oprávnění (role auditor může být i vedlejší, viz User.roles)
+    if not (current.has_role("auditor") or current.has_role("admin")):
         raise HTTPException(
             status_code=403,
-            detail="Toto přidělení nepatří tomuto auditorovi"
+            detail="Jen auditor nebo admin může zahájit audit"
         )
 
-    if current.role not in ["auditor", "admin"]:
+    if not current.has_role("admin") and assignment.auditor_id != current.id:
         raise HTTPException(
             status_code=403,
-            detail="Jen auditor nebo admin může zahájit audit"
+            detail="Toto přidělení nepatří tomuto auditorovi"
         )
 
     # 3) Ověř stav přidělení
@@ -63,7 +66,9 @@ def start_audit(
     assignment.status = "in_progress"
 
     db.add(execution)
+    stats_rollup.record_execution_started(db, assignment_id)
     db.commit()
+    dashboard_cache.invalidate()
     db.refresh(execution)
 
     return {
@@ -106,10 +111,13 @@ def finish_audit(
     if not execution:
         raise HTTPException(status_code=404, detail="Audit nenalezen")
 
-    if current.role == "auditor" and execution.auditor_id != current.id:
+    if current.has_role("auditor") and not current.has_role("admin") and execution.auditor_id != current.id:
         raise HTTPException(status_code=403, detail="Toto není tvůj audit")
 
-    # Uzavřeme audit
+    # Uzavřeme audit (rollup jen při prvním uzavření)
+    if execution.status != "done":
+        stats_rollup.record_audit_finished(db, execution.assignment_id)
+
     execution.status = "done"
     execution.finished_at = datetime.utcnow()
 
@@ -125,6 +133,7 @@ def finish_audit(
         assignment.datum_provedeni = date.today()
 
     db.commit()
+    dashboard_cache.invalidate()
 
     return {"message": "Audit úspěšně ukončen"}
 
@@ -145,7 +154,7 @@ def get_execution_by_assignment_path(
 
     return {"execution_id": execution.id}
 
-@router.get("/{execution_id}")
+@router.get("/{execution_id:int}")
 def get_execution(
     execution_id: int,
     current: User = Depends(get_current_user),
@@ -164,22 +173,36 @@ def get_execution(
 
 # ========== NOVÉ ENDPOINTY PRO PŘEHLED AUDITŮ ==========
 
-@router.get("/list")
-def list_audits(
+LIST_PAGE_SIZE = 50
+LIST_MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(started_at: datetime, execution_id: int) -> str:
+    raw = f"{started_at.isoformat()}|{execution_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        started_at, execution_id = raw.split("|")
+        return datetime.fromisoformat(started_at), int(execution_id)
+    except ValueError:
+        raise HTTPException(400, "Neplatný kurzor")
+
+
+def _audits_query(
+    db: Session,
     status: Optional[str] = None,
     line_id: Optional[int] = None,
     category_id: Optional[int] = None,
     auditor_id: Optional[int] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    result_filter: Optional[str] = Query(None, description="all, ok, nok"),
+    result_filter: Optional[str] = None,
     month: Optional[str] = None,
-    current: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
-    """
-    Vrátí seznam všech auditů s filtry a statistikami
-    """
+    """Dotaz pro přehled auditů se všemi filtry (bez řazení a stránkování)"""
     query = (
         db.query(
             AuditExecution,
@@ -218,50 +241,167 @@ def list_audits(
     if month:
         query = query.filter(LpaCampaign.month == month)
 
-    results = query.order_by(AuditExecution.started_at.desc()).all()
+    # Filtr podle výsledku (počitadla na execution)
+    if result_filter == "ok":
+        query = query.filter(AuditExecution.nok_count == 0)
+    elif result_filter == "nok":
+        query = query.filter(AuditExecution.nok_count > 0)
 
-    # Zpracuj výsledky a přidej statistiky
-    audits_list = []
-    
-    for execution, assignment, line_name, category_name, campaign_month, auditor_name in results:
-        # Spočítej OK/NOK pro tento audit
-        answers = (
-            db.query(AuditAnswer)
-            .filter(AuditAnswer.audit_execution_id == execution.id)
-            .all()
+    return query
+
+
+def _audit_row(execution, assignment, line_name, category_name, campaign_month, auditor_name):
+    return {
+        "execution_id": execution.id,
+        "assignment_id": assignment.id,
+        "status": execution.status,
+        "started_at": execution.started_at,
+        "finished_at": execution.finished_at,
+        "line_name": line_name,
+        "category_name": category_name,
+        "month": campaign_month,
+        "auditor_name": auditor_name,
+        "auditor_id": execution.auditor_id,
+        "stats": {
+            "total": execution.total_count,
+            "ok": execution.ok_count,
+            "nok": execution.nok_count,
+            "ok_percent": (
+                round((execution.ok_count / execution.total_count) * 100, 1)
+                if execution.total_count > 0
+                else 0
+            ),
+        }
+    }
+
+
+@router.get("/list")
+def list_audits(
+    status: Optional[str] = None,
+    line_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    auditor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    result_filter: Optional[str] = Query(None, description="all, ok, nok"),
+    month: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor z předchozí stránky"),
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    with_total: bool = False,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Vrátí stránku auditů s filtry a statistikami.
+    Stránkování je keyset podle (started_at, id) – každá stránka stojí stejně.
+    """
+    query = _audits_query(
+        db,
+        status=status,
+        line_id=line_id,
+        category_id=category_id,
+        auditor_id=auditor_id,
+        date_from=date_from,
+        date_to=date_to,
+        result_filter=result_filter,
+        month=month,
+    )
+
+    total = None
+    if with_total:
+        total = query.with_entities(func.count(AuditExecution.id)).scalar()
+
+    if cursor:
+        cursor_started_at, cursor_id = _decode_cursor(cursor)
+        query = query.filter(
+            tuple_(AuditExecution.started_at, AuditExecution.id)
+            < tuple_(cursor_started_at, cursor_id)
         )
-        
-        total = len(answers)
-        ok_count = sum(1 for a in answers if a.odpoved == "OK")
-        nok_count = sum(1 for a in answers if a.odpoved == "NOK")
-        ok_percent = round((ok_count / total) * 100, 1) if total > 0 else 0
-        
-        # Filtr podle výsledku
-        if result_filter == "ok" and nok_count > 0:
-            continue
-        if result_filter == "nok" and nok_count == 0:
-            continue
-        
-        audits_list.append({
-            "execution_id": execution.id,
-            "assignment_id": assignment.id,
-            "status": execution.status,
-            "started_at": execution.started_at,
-            "finished_at": execution.finished_at,
-            "line_name": line_name,
-            "category_name": category_name,
-            "month": campaign_month,
-            "auditor_name": auditor_name,
-            "auditor_id": execution.auditor_id,
-            "stats": {
-                "total": total,
-                "ok": ok_count,
-                "nok": nok_count,
-                "ok_percent": ok_percent,
-            }
-        })
-
-    return audits_list
+
+    # O jeden řádek navíc, abychom věděli, jestli existuje další stránka
+    results = (
+        query.order_by(AuditExecution.started_at.desc(), AuditExecution.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    has_more = len(results) > limit
+    results = results[:limit]
+
+    next_cursor = None
+    if has_more:
+        last_execution = results[-1][0]
+        next_cursor = _encode_cursor(last_execution.started_at, last_execution.id)
+
+    return {
+        "items": [_audit_row(*row) for row in results],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "total": total,
+    }
+
+
+AUDIT_EXPORT_COLUMNS = [
+    "ID auditu", "ID přidělení", "Měsíc", "Linka", "Kategorie", "Auditor",
+    "Stav", "Zahájeno", "Dokončeno", "Otázek", "OK", "NOK", "OK %",
+]
+
+
+def _audit_export_row(*row):
+    audit = _audit_row(*row)
+    stats = audit["stats"]
+    return [
+        audit["execution_id"],
+        audit["assignment_id"],
+        audit["month"],
+        audit["line_name"],
+        audit["category_name"],
+        audit["auditor_name"],
+        audit["status"],
+        audit["started_at"],
+        audit["finished_at"],
+        stats["total"],
+        stats["ok"],
+        stats["nok"],
+        stats["ok_percent"],
+    ]
+
+
+@router.get("/export")
+def export_audits(
+    format: str = Query("csv", description="csv nebo xlsx"),
+    status: Optional[str] = None,
+    line_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    auditor_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    result_filter: Optional[str] = Query(None, description="all, ok, nok"),
+    month: Optional[str] = None,
+    current: User = Depends(get_current_user),
+):
+    """Export přehledu auditů (stejné filtry jako /list), streamovaný po dávkách"""
+
+    def build_query(db: Session):
+        return _audits_query(
+            db,
+            status=status,
+            line_id=line_id,
+            category_id=category_id,
+            auditor_id=auditor_id,
+            date_from=date_from,
+            date_to=date_to,
+            result_filter=result_filter,
+            month=month,
+        ).order_by(AuditExecution.started_at.desc(), AuditExecution.id.desc())
+
+    return export_response(
+        format,
+        filename_stem="audity",
+        sheet_title="Audity",
+        columns=AUDIT_EXPORT_COLUMNS,
+        rows=iter_query_rows(build_query, _audit_export_row),
+    )
 
 
 @router.get("/stats/summary")
@@ -272,50 +412,39 @@ def get_overall_stats(
     db: Session = Depends(get_db),
 ):
     """
-    Vrátí celkové statistiky auditů
+    Vrátí celkové statistiky auditů (jeden agregační dotaz nad počitadly)
     """
-    query = db.query(AuditExecution)
+    query = db.query(
+        func.count(AuditExecution.id).label("total_audits"),
+        func.count(AuditExecution.id)
+        .filter(AuditExecution.status == "done")
+        .label("completed"),
+        func.count(AuditExecution.id)
+        .filter(AuditExecution.status == "in_progress")
+        .label("in_progress"),
+        func.coalesce(func.sum(AuditExecution.total_count), 0).label("total_questions"),
+        func.coalesce(func.sum(AuditExecution.ok_count), 0).label("ok_count"),
+        func.coalesce(func.sum(AuditExecution.nok_count), 0).label("nok_count"),
+    )
     
     if date_from:
         query = query.filter(AuditExecution.started_at >= date_from)
     if date_to:
         query = query.filter(AuditExecution.started_at <= date_to)
     
-    executions = query.all()
-    execution_ids = [e.id for e in executions]
-    
-    if not execution_ids:
-        return {
-            "total_audits": 0,
-            "completed_audits": 0,
-            "in_progress_audits": 0,
-            "total_questions": 0,
-            "ok_answers": 0,
-            "nok_answers": 0,
-            "ok_percent": 0,
-        }
-    
-    answers = (
-        db.query(AuditAnswer)
-        .filter(AuditAnswer.audit_execution_id.in_(execution_ids))
-        .all()
+    totals = query.one()
+
+    total_questions = totals.total_questions
+    ok_percent = (
+        round((totals.ok_count / total_questions) * 100, 1) if total_questions > 0 else 0
     )
     
-    total_audits = len(executions)
-    completed = sum(1 for e in executions if e.status == "done")
-    in_progress = sum(1 for e in executions if e.status == "in_progress")
-    
-    total_questions = len(answers)
-    ok_count = sum(1 for a in answers if a.odpoved == "OK")
-    nok_count = sum(1 for a in answers if a.odpoved == "NOK")
-    ok_percent = round((ok_count / total_questions) * 100, 1) if total_questions > 0 else 0
-    
     return {
-        "total_audits": total_audits,
-        "completed_audits": completed,
-        "in_progress_audits": in_progress,
+        "total_audits": totals.total_audits,
+        "completed_audits": totals.completed,
+        "in_progress_audits": totals.in_progress,
         "total_questions": total_questions,
-        "ok_answers": ok_count,
-        "nok_answers": nok_count,
+        "ok_answers": totals.ok_count,
+        "nok_answers": totals.nok_count,
         "ok_percent": ok_percent,
     }
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import Session, aliased
 from datetime import datetime, date
 from typing import Optional
 from pydantic import BaseModel
@@ -15,11 +16,18 @@ from ..models import (
     AuditAnswer,
     ChecklistQuestion,
 )
-from ..email_service import send_issue_assignment_email
+from ..cache import dashboard_cache, neshoda_detail_cache
+from .. import outbox, photo_derivatives
 
 router = APIRouter()
 
 
+def _neshoda_changed(neshoda_id: int):
+    """Po změně stavu neshody: zahodit její cachovaný detail i dashboard"""
+    neshoda_detail_cache.delete(neshoda_id)
+    dashboard_cache.invalidate()
+
+
 class AssignSolverRequest(BaseModel):
     solver_id: int
     termin: Optional[date] = None
@@ -29,44 +37,104 @@ class AssignSolverRequest(BaseModel):
 # ======== SEZNAM NESHOD ========
 
 
+NESHODY_PAGE_SIZE = 50
+NESHODY_MAX_PAGE_SIZE = 500
+
+
 @router.get("/")
 def list_neshody(
+    status: Optional[str] = None,
+    solver_id: Optional[int] = None,
+    line_id: Optional[int] = None,
+    zavaznost: Optional[str] = Query(None, description="low / medium / high"),
+    cursor: Optional[int] = Query(None, description="next_cursor z předchozí stránky"),
+    limit: int = Query(NESHODY_PAGE_SIZE, ge=1, le=NESHODY_MAX_PAGE_SIZE),
     current: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    q = (
-        db.query(Neshoda, AuditExecution, LpaAssignment, Line, ChecklistCategory)
+    """
+    Stránka neshod (nejnovější první) jedním dotazem – včetně fotky
+    a jména řešitele. Stránkování keyset podle id.
+    """
+    Solver = aliased(User)
+    LinkedAnswer = aliased(AuditAnswer)
+
+    # Starší neshody nemají answer_id – fotka z první NOK odpovědi auditu
+    fallback_picture = (
+        select(AuditAnswer.picture_url)
+        .where(
+            Neshoda.answer_id.is_(None),
+            AuditAnswer.audit_execution_id == Neshoda.audit_execution_id,
+            AuditAnswer.odpoved == "NOK",
+            AuditAnswer.picture_url.isnot(None),
+        )
+        .order_by(AuditAnswer.id)
+        .limit(1)
+        .lateral()
+    )
+
+    query = (
+        db.query(
+            Neshoda,
+            Line.name.label("line_name"),
+            ChecklistCategory.name.label("category_name"),
+            Solver.jmeno.label("solver_name"),
+            func.coalesce(LinkedAnswer.picture_url, fallback_picture.c.picture_url).label(
+                "picture_url"
+            ),
+        )
         .join(AuditExecution, Neshoda.audit_execution_id == AuditExecution.id)
         .join(LpaAssignment, AuditExecution.assignment_id == LpaAssignment.id)
         .join(Line, LpaAssignment.line_id == Line.id)
         .join(ChecklistCategory, LpaAssignment.category_id == ChecklistCategory.id)
+        .outerjoin(Solver, Neshoda.solver_id == Solver.id)
+        .outerjoin(LinkedAnswer, Neshoda.answer_id == LinkedAnswer.id)
+        .outerjoin(fallback_picture, true())
     )
 
-    results = q.all()
+    # Filtry
+    if status:
+        query = query.filter(Neshoda.status == status)
 
-    return [
-        {
-            "id": n.id,
-            "status": n.status,
-            "zavaznost": n.zavaznost,
-            "popis": n.popis,
-            "poznamka": n.poznamka,
-            "solver_id": n.solver_id,
-            "termin": n.termin,
-            "line_name": line.name,
-            "category_name": cat.name,
-            "picture_url": (
-                ans.picture_url
-                if (
-                    ans := db.query(AuditAnswer)
-                    .filter(AuditAnswer.audit_execution_id == n.audit_execution_id)
-                    .first()
-                )
-                else None
-            ),
-        }
-        for n, exec, assign, line, cat in results
-    ]
+    if solver_id:
+        query = query.filter(Neshoda.solver_id == solver_id)
+
+    if line_id:
+        query = query.filter(LpaAssignment.line_id == line_id)
+
+    if zavaznost:
+        query = query.filter(Neshoda.zavaznost == zavaznost)
+
+    if cursor:
+        query = query.filter(Neshoda.id < cursor)
+
+    # O jeden řádek navíc, abychom věděli, jestli existuje další stránka
+    results = query.order_by(Neshoda.id.desc()).limit(limit + 1).all()
+
+    has_more = len(results) > limit
+    results = results[:limit]
+
+    return {
+        "items": [
+            {
+                "id": n.id,
+                "status": n.status,
+                "zavaznost": n.zavaznost,
+                "popis": n.popis,
+                "poznamka": n.poznamka,
+                "solver_id": n.solver_id,
+                "solver_name": solver_name,
+                "termin": n.termin,
+                "line_name": line_name,
+                "category_name": category_name,
+                "picture_url": picture_url,
+                **photo_derivatives.photo_urls(picture_url),
+            }
+            for n, line_name, category_name, solver_name, picture_url in results
+        ],
+        "next_cursor": results[-1][0].id if has_more else None,
+        "has_more": has_more,
+    }
 
 
 # ======== PŘEVZETÍ NESHODY ========
@@ -92,6 +160,7 @@ def take_over_neshoda(
     n.solver_id = current.id  # přiřadíme řešitele
 
     db.commit()
+    _neshoda_changed(neshoda_id)
     db.refresh(n)
     return n
 
@@ -122,6 +191,7 @@ def set_known_solution(
         n.poznamka = note
 
     db.commit()
+    _neshoda_changed(neshoda_id)
     db.refresh(n)
     return n
 
@@ -152,6 +222,7 @@ def implement_solution(
         n.poznamka = note
 
     db.commit()
+    _neshoda_changed(neshoda_id)
     db.refresh(n)
     return n
 
@@ -169,7 +240,7 @@ def assign_solver_with_deadline(
     """Auditor nebo admin může přiřadit řešitele a termín nápravy s odesláním emailu"""
 
     # Ověření oprávnění
-    if current.role not in ["auditor", "admin"]:
+    if not (current.has_role("auditor") or current.has_role("admin")):
         raise HTTPException(403, "Pouze auditor nebo admin může přiřadit řešitele")
 
     # Najdi neshodu
@@ -220,31 +291,31 @@ def assign_solver_with_deadline(
     if data.poznamka:
         neshoda.poznamka = data.poznamka
 
+    # Email řešiteli – do outboxu ve stejné transakci, odešle worker
+    outbox.enqueue_email(
+        db,
+        "issue_assignment",
+        to_email=solver.email,
+        solver_name=solver.jmeno,
+        issue_description=neshoda.popis,
+        line_name=line.name if line else "Neznámá linka",
+        category_name=category.name if category else "Neznámá kategorie",
+        severity=neshoda.zavaznost or "medium",
+        deadline=data.termin.isoformat() if data.termin else "Neurčeno",
+        issue_id=neshoda.id,
+    )
+
     db.commit()
+    _neshoda_changed(neshoda_id)
+    outbox.wake()
     db.refresh(neshoda)
 
-    # Odešli email řešiteli
-    try:
-        send_issue_assignment_email(
-            to_email=solver.email,
-            solver_name=solver.jmeno,
-            issue_description=neshoda.popis,
-            line_name=line.name if line else "Neznámá linka",
-            category_name=category.name if category else "Neznámá kategorie",
-            severity=neshoda.zavaznost or "medium",
-            deadline=data.termin.isoformat() if data.termin else "Neurčeno",
-            issue_id=neshoda.id,
-        )
-    except Exception as e:
-        print(f"Chyba při odesílání emailu: {e}")
-        # Email selhal, ale přiřazení proběhlo
-
     return {
         "message": "Řešitel úspěšně přiřazen",
         "neshoda_id": neshoda.id,
         "solver_name": solver.jmeno,
         "termin": neshoda.termin,
-        "email_sent": True,
+        "email_queued": True,
     }
 
 
@@ -275,6 +346,7 @@ def assign_solver(
     neshoda.assigned_at = datetime.utcnow()
 
     db.commit()
+    _neshoda_changed(neshoda_id)
     return {"message": "Řešitel přidělen"}
 
 
@@ -297,6 +369,7 @@ def take_issue(
     issue.solver_id = current.id
 
     db.commit()
+    _neshoda_changed(id)
     return {"ok": True}
 
 
@@ -327,6 +400,7 @@ def resolve_neshoda(
     neshoda.resolved_at = datetime.utcnow()
 
     db.commit()
+    _neshoda_changed(neshoda_id)
     return {"message": "Neshoda označena jako vyřešená"}
 
 
@@ -345,13 +419,14 @@ def close_issue(
         raise HTTPException(404, "Neshoda nenalezena")
 
     # Jen auditor nebo admin může uzavřít
-    if current.role not in ["auditor", "admin"]:
+    if not (current.has_role("auditor") or current.has_role("admin")):
         raise HTTPException(403, "Nemáš oprávnění uzavřít neshodu")
 
     issue.status = "closed"
     issue.closed_at = datetime.utcnow()
 
     db.commit()
+    _neshoda_changed(id)
     return {"ok": True}
 
 
@@ -387,45 +462,46 @@ def get_neshoda_detail(
     db: Session = Depends(get_db),
 ):
     """Vrátí detail neshody včetně fotky z auditu"""
+    return neshoda_detail_cache.get_or_set(
+        neshoda_id, lambda: _compute_neshoda_detail(db, neshoda_id)
+    )
 
-    neshoda = db.query(Neshoda).filter(Neshoda.id == neshoda_id).first()
-    if not neshoda:
-        raise HTTPException(404, "Neshoda nenalezena")
 
-    # Najdi souvisící execution
-    execution = (
-        db.query(AuditExecution)
-        .filter(AuditExecution.id == neshoda.audit_execution_id)
+def _compute_neshoda_detail(db: Session, neshoda_id: int):
+    Solver = aliased(User)
+
+    # Neshoda + audit + linka + oblast + řešitel jedním dotazem
+    row = (
+        db.query(
+            Neshoda,
+            AuditExecution.id.label("execution_id"),
+            AuditExecution.started_at,
+            Line.name.label("line_name"),
+            ChecklistCategory.name.label("category_name"),
+            Solver.id.label("solver_id"),
+            Solver.jmeno.label("solver_jmeno"),
+            Solver.email.label("solver_email"),
+        )
+        .outerjoin(AuditExecution, Neshoda.audit_execution_id == AuditExecution.id)
+        .outerjoin(LpaAssignment, AuditExecution.assignment_id == LpaAssignment.id)
+        .outerjoin(Line, LpaAssignment.line_id == Line.id)
+        .outerjoin(ChecklistCategory, LpaAssignment.category_id == ChecklistCategory.id)
+        .outerjoin(Solver, Neshoda.solver_id == Solver.id)
+        .filter(Neshoda.id == neshoda_id)
         .first()
     )
 
-    if not execution:
-        raise HTTPException(404, "Audit execution nenalezen")
+    if not row:
+        raise HTTPException(404, "Neshoda nenalezena")
 
-    # Najdi assignment pro kontext
-    assignment = (
-        db.query(LpaAssignment)
-        .filter(LpaAssignment.id == execution.assignment_id)
-        .first()
-    )
+    neshoda = row.Neshoda
 
-    # Najdi linku a kategorii
-    line = (
-        db.query(Line).filter(Line.id == assignment.line_id).first()
-        if assignment
-        else None
-    )
-    category = (
-        db.query(ChecklistCategory)
-        .filter(ChecklistCategory.id == assignment.category_id)
-        .first()
-        if assignment
-        else None
-    )
+    if row.execution_id is None:
+        raise HTTPException(404, "Audit execution nenalezen")
 
-    # Najdi NOK odpovědi s fotkami pro tento execution
+    # NOK odpovědi s fotkami pro tento execution
     nok_answers = (
-        db.query(AuditAnswer, ChecklistQuestion.question_text)
+        db.query(AuditAnswer.picture_url, ChecklistQuestion.question_text)
         .join(ChecklistQuestion, AuditAnswer.question_id == ChecklistQuestion.id)
         .filter(
             AuditAnswer.audit_execution_id == neshoda.audit_execution_id,
@@ -434,11 +510,6 @@ def get_neshoda_detail(
         .all()
     )
 
-    # Najdi řešitele, pokud je přiřazen
-    solver = None
-    if neshoda.solver_id:
-        solver = db.query(User).filter(User.id == neshoda.solver_id).first()
-
     return {
         "id": neshoda.id,
         "popis": neshoda.popis,
@@ -448,24 +519,25 @@ def get_neshoda_detail(
         "termin": neshoda.termin,
         "solver": (
             {
-                "id": solver.id,
-                "jmeno": solver.jmeno,
-                "email": solver.email,
+                "id": row.solver_id,
+                "jmeno": row.solver_jmeno,
+                "email": row.solver_email,
             }
-            if solver
+            if row.solver_id
             else None
         ),
         "audit_info": {
-            "execution_id": execution.id,
-            "started_at": execution.started_at,
-            "line_name": line.name if line else None,
-            "category_name": category.name if category else None,
+            "execution_id": row.execution_id,
+            "started_at": row.started_at,
+            "line_name": row.line_name,
+            "category_name": row.category_name,
         },
         "nok_items": [
             {
                 "question_text": question_text,
-                "picture_url": answer.picture_url,
+                "picture_url": picture_url,
+                **photo_derivatives.photo_urls(picture_url),
             }
-            for answer, question_text in nok_answers
+            for picture_url, question_text in nok_answers
         ],
     }
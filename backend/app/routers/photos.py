@@ -0,0 +1,118 @@
+"""
+Servírování fotek z auditů jen pro přihlášené uživatele.
+
+Nahrazuje veřejný StaticFiles mount /uploads. Přístup buď s tokenem
+v hlavičce Authorization, nebo přes podepsanou URL z API odpovědí
+(?expires=&signature=, viz photo_access) – tu používá <img src>, session
+token se do URL nedává. Samotný přenos souboru:
+- za nginxem (PHOTO_ACCEL_REDIRECT_PREFIX) se pošle jen X-Accel-Redirect
+  a soubor odešle proxy,
+- bez proxy FileResponse (server s podporou ASGI pathsend/zerocopysend
+  použije sendfile).
+
+Soubory pojmenované podle hashe obsahu se nikdy nemění, proto dostanou
+immutable Cache-Control a ETag = hash.
+"""
+
+import os
+import re
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+
+from ..auth import get_db, user_from_token
+from ..uploads import UPLOAD_DIR, UPLOAD_TMP_DIR
+from .. import photo_access
+
+load_dotenv()
+
+# např. "/protected-uploads/" -> nginx: location /protected-uploads/ { internal; alias .../uploads/; }
+PHOTO_ACCEL_REDIRECT_PREFIX = os.getenv("PHOTO_ACCEL_REDIRECT_PREFIX", "")
+
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE = "private, no-cache"
+
+MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+    ".heic": "image/heic",
+}
+
+# <sha256>.ext nebo <sha256>_<varianta>.webp
+CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64})(_[a-z]+)?$")
+
+router = APIRouter()
+
+optional_bearer = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+
+def _resolve_photo(path: str) -> str:
+    """Ověří, že cesta míří na fotku uvnitř uploads/ (ne do .tmp ani ven)"""
+    upload_root = os.path.realpath(UPLOAD_DIR)
+    file_path = os.path.realpath(os.path.join(upload_root, path))
+
+    if os.path.commonpath([upload_root, file_path]) != upload_root:
+        raise HTTPException(status_code=404, detail="Fotka nenalezena")
+    if file_path.startswith(os.path.realpath(UPLOAD_TMP_DIR) + os.sep):
+        raise HTTPException(status_code=404, detail="Fotka nenalezena")
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in MEDIA_TYPES or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="Fotka nenalezena")
+
+    return file_path
+
+
+def _cache_headers(file_path: str) -> dict:
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    if CONTENT_ADDRESSED.match(stem):
+        return {"ETag": f'"{stem}"', "Cache-Control": IMMUTABLE_CACHE}
+
+    # starší soubory pojmenované podle auditu se mohly přepsat
+    stat = os.stat(file_path)
+    return {
+        "ETag": f'"{int(stat.st_mtime)}-{stat.st_size}"',
+        "Cache-Control": REVALIDATE_CACHE,
+    }
+
+
+@router.get("/{path:path}")
+def get_photo(
+    path: str,
+    request: Request,
+    expires: Optional[int] = None,
+    signature: Optional[str] = None,
+    bearer: Optional[str] = Depends(optional_bearer),
+    db: Session = Depends(get_db),
+):
+    if expires is not None and signature:
+        if not photo_access.verify(f"{UPLOAD_DIR}/{path}", expires, signature):
+            raise HTTPException(status_code=403, detail="Neplatný nebo prošlý odkaz na fotku")
+    elif bearer:
+        user_from_token(bearer, db)
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    db.close()  # DB už není potřeba, ať spojení nedržíme během přenosu
+
+    file_path = _resolve_photo(path)
+    headers = _cache_headers(file_path)
+    media_type = MEDIA_TYPES[os.path.splitext(file_path)[1].lower()]
+
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    if PHOTO_ACCEL_REDIRECT_PREFIX:
+        relative = os.path.relpath(file_path, os.path.realpath(UPLOAD_DIR))
+        headers["X-Accel-Redirect"] = (
+            PHOTO_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative.replace(os.sep, "/")
+        )
+        return Response(headers=headers, media_type=media_type)
+
+    return FileResponse(file_path, media_type=media_type, headers=headers)
@@ -0,0 +1,178 @@
+"""
+Vyhledávání v nálezech z auditů (NOK odpovědi + jejich neshody).
+
+Hledá se v textu otázky a v popisu / poznámce neshody:
+- fulltext (tsvector, konfigurace 'simple' – bez českého slovníku, slova se
+  porovnávají tak, jak jsou),
+- trigramy (pg_trgm, word_similarity) – najdou i části slov a překlepy.
+
+Indexy vytváří migrate_search_indexes.py; výrazy tady musí odpovídat
+výrazům v indexech, jinak je planner nepoužije. Kandidáti se proto hledají
+zvlášť v každé tabulce (každý poddotaz jde přes své GIN indexy) a spojí
+se přes UNION – jedno OR přes outer join by indexy použít nedokázalo.
+"""
+
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, literal, literal_column, or_, select, union
+from sqlalchemy.orm import Session
+
+from ..auth import get_db, get_current_user
+from ..models import (
+    User,
+    AuditAnswer,
+    AuditExecution,
+    LpaAssignment,
+    Line,
+    ChecklistQuestion,
+    ChecklistCategory,
+    Neshoda,
+)
+from .. import photo_derivatives
+
+router = APIRouter()
+
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+
+# regconfig jako literál (ne bind parametr), aby výraz seděl s indexem
+TS_CONFIG = literal_column("'simple'::regconfig")
+
+
+def question_tsvector():
+    return func.to_tsvector(TS_CONFIG, ChecklistQuestion.question_text)
+
+
+def neshoda_tsvector():
+    empty = literal_column("''")
+    return func.to_tsvector(
+        TS_CONFIG,
+        func.coalesce(Neshoda.popis, empty)
+        .op("||")(literal_column("' '"))
+        .op("||")(func.coalesce(Neshoda.poznamka, empty)),
+    )
+
+
+@router.get("/findings")
+def search_findings(
+    q: str = Query(..., min_length=2, description="Hledaný text"),
+    line_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Nálezy seřazené podle relevance (fulltext rank + trigramová podobnost).
+    Filtry stejné jako /answers/nok-list.
+    """
+    term = q.strip()
+    ts_query = func.websearch_to_tsquery(TS_CONFIG, term)
+    term_literal = literal(term)
+
+    question_ts = question_tsvector()
+    neshoda_ts = neshoda_tsvector()
+
+    # Kandidáti: NOK odpovědi na otázky, které odpovídají hledání ...
+    matching_questions = select(ChecklistQuestion.id).where(
+        or_(
+            question_ts.op("@@")(ts_query),
+            term_literal.op("<%")(ChecklistQuestion.question_text),
+        )
+    )
+    question_matches = select(AuditAnswer.id.label("answer_id")).where(
+        AuditAnswer.odpoved == "NOK",
+        AuditAnswer.question_id.in_(matching_questions),
+    )
+    # ... a odpovědi, jejichž neshoda odpovídá hledání
+    neshoda_matches = select(Neshoda.answer_id).where(
+        Neshoda.answer_id.isnot(None),
+        or_(
+            neshoda_ts.op("@@")(ts_query),
+            term_literal.op("<%")(Neshoda.popis),
+            term_literal.op("<%")(Neshoda.poznamka),
+        ),
+    )
+    matches = union(question_matches, neshoda_matches).subquery()
+
+    rank = (
+        func.greatest(
+            func.ts_rank(question_ts, ts_query),
+            func.ts_rank(neshoda_ts, ts_query),
+        )
+        + func.greatest(
+            func.word_similarity(term_literal, ChecklistQuestion.question_text),
+            func.word_similarity(term_literal, func.coalesce(Neshoda.popis, "")),
+            func.word_similarity(term_literal, func.coalesce(Neshoda.poznamka, "")),
+        )
+    ).label("rank")
+
+    query = (
+        db.query(
+            AuditAnswer,
+            ChecklistQuestion.question_text,
+            AuditExecution.started_at,
+            Line.name.label("line_name"),
+            ChecklistCategory.name.label("category_name"),
+            Neshoda,
+            rank,
+        )
+        .join(matches, matches.c.answer_id == AuditAnswer.id)
+        .join(ChecklistQuestion, AuditAnswer.question_id == ChecklistQuestion.id)
+        .join(AuditExecution, AuditAnswer.audit_execution_id == AuditExecution.id)
+        .join(LpaAssignment, AuditExecution.assignment_id == LpaAssignment.id)
+        .join(Line, LpaAssignment.line_id == Line.id)
+        .join(ChecklistCategory, LpaAssignment.category_id == ChecklistCategory.id)
+        .outerjoin(Neshoda, Neshoda.answer_id == AuditAnswer.id)
+        .filter(AuditAnswer.odpoved == "NOK")
+    )
+
+    if line_id:
+        query = query.filter(LpaAssignment.line_id == line_id)
+
+    if category_id:
+        query = query.filter(LpaAssignment.category_id == category_id)
+
+    if date_from:
+        query = query.filter(AuditExecution.started_at >= date_from)
+
+    if date_to:
+        query = query.filter(AuditExecution.started_at <= date_to)
+
+    rows = (
+        query.order_by(rank.desc(), AuditExecution.started_at.desc(), AuditAnswer.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "items": [
+            {
+                "id": answer.id,
+                "question_text": question_text,
+                "picture_url": answer.picture_url,
+                **photo_derivatives.photo_urls(answer.picture_url),
+                "execution_id": answer.audit_execution_id,
+                "execution_date": started_at.date() if started_at else None,
+                "line_name": line_name,
+                "category_name": category_name,
+                "neshoda_id": neshoda.id if neshoda else None,
+                "neshoda_status": neshoda.status if neshoda else None,
+                "neshoda_popis": neshoda.popis if neshoda else None,
+                "neshoda_poznamka": neshoda.poznamka if neshoda else None,
+                "rank": round(float(row_rank), 4),
+            }
+            for answer, question_text, started_at, line_name, category_name, neshoda, row_rank in rows
+        ],
+        "offset": offset,
+        "next_offset": offset + limit if has_more else None,
+        "has_more": has_more,
+    }
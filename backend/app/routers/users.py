@@ -32,6 +32,11 @@ class UserUpdate(BaseModel):
     jmeno: str = None
     email: str = None
     roles: list[str] = None
+    email_delivery: str = None  # "digest" / "immediate"
+    audit_capacity: int | None = None  # max. auditů za měsíc, 0 = bez limitu
+
+
+EMAIL_DELIVERY_MODES = {"digest", "immediate"}
 
 
 # ===========================
@@ -84,6 +89,8 @@ def list_users(
             "roles": u.get_roles_list(),
             "force_password_change": u.force_password_change,
             "is_active": u.is_active,
+            "email_delivery": u.email_delivery,
+            "audit_capacity": u.audit_capacity,
         }
         for u in users
     ]
@@ -203,6 +210,16 @@ def update_user(
         user.role = primary_role
         user.roles = ",".join(user_data.roles)
 
+    if user_data.email_delivery is not None:
+        if user_data.email_delivery not in EMAIL_DELIVERY_MODES:
+            raise HTTPException(status_code=400, detail="Invalid email delivery mode")
+        user.email_delivery = user_data.email_delivery
+
+    if user_data.audit_capacity is not None:
+        if user_data.audit_capacity < 0:
+            raise HTTPException(status_code=400, detail="Invalid audit capacity")
+        user.audit_capacity = user_data.audit_capacity or None
+
     db.commit()
     db.refresh(user)
 
@@ -212,6 +229,8 @@ def update_user(
         "email": user.email,
         "role": user.role,
         "roles": user.get_roles_list(),
+        "email_delivery": user.email_delivery,
+        "audit_capacity": user.audit_capacity,
     }
 
 
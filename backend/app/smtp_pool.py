@@ -0,0 +1,177 @@
+"""
+Pool SMTP spojení pro hromadné odesílání.
+
+Navázání spojení, STARTTLS a přihlášení stojí víc než samotné odeslání
+zprávy, proto se přihlášená spojení nezavírají, ale vrací do poolu a další
+zprávy je použijí znovu:
+- počet současně otevřených spojení je omezený (SMTP_POOL_SIZE),
+- spojení se po SMTP_MAX_MESSAGES_PER_CONNECTION zprávách nebo po
+  SMTP_IDLE_TIMEOUT sekundách nečinnosti zavře (servery dlouhá spojení
+  stejně shazují),
+- když server znovu použité spojení mezitím zavřel, naváže se nové
+  a zpráva se pošle ještě jednou.
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from email.message import Message
+
+from dotenv import load_dotenv
+
+from .email_config import SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "30"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+
+# Chyby konkrétní zprávy – spojení po nich zůstává použitelné
+MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class _PooledConnection:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            self.server.close()
+
+
+class SMTPConnectionPool:
+    """Thread-safe pool přihlášených SMTP spojení"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str | None = None,
+        password: str | None = None,
+        starttls: bool = True,
+        max_connections: int = 4,
+        max_messages_per_connection: int = 100,
+        idle_timeout: float = 30,
+        timeout: float = 30,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle: list[_PooledConnection] = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> _PooledConnection:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.user:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.connections_opened += 1
+        return _PooledConnection(server)
+
+    def _checkout(self) -> tuple[_PooledConnection, bool]:
+        """Vrací (spojení, zda je znovu použité)"""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if now - conn.last_used <= self.idle_timeout:
+                    return conn, True
+                conn.close()
+        return self._connect(), False
+
+    def _checkin(self, conn: _PooledConnection):
+        if conn.sent >= self.max_messages_per_connection:
+            conn.close()
+            return
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(conn)
+
+    def send_message(self, msg: Message):
+        """
+        Odešle zprávu přes volné spojení z poolu. Když je pool plný,
+        čeká se, až se některé spojení uvolní.
+        """
+        with self._slots:
+            while True:
+                conn, reused = self._checkout()
+                try:
+                    conn.server.send_message(msg)
+                except MESSAGE_ERRORS:
+                    self._checkin(conn)
+                    raise
+                except OSError as e:
+                    # odpojení / timeout (SMTPException je také OSError)
+                    conn.close()
+                    if not reused:
+                        raise
+                    logger.info(f"SMTP spojení bylo zavřeno ({e}), navazuji nové")
+                    continue
+
+                conn.sent += 1
+                self._checkin(conn)
+                return
+
+    def close(self):
+        """Zavře všechna nečinná spojení"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def get_pool() -> SMTPConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPConnectionPool(
+                SMTP_HOST,
+                SMTP_PORT,
+                SMTP_USER,
+                SMTP_PASSWORD,
+                starttls=SMTP_STARTTLS,
+                max_connections=SMTP_POOL_SIZE,
+                max_messages_per_connection=SMTP_MAX_MESSAGES_PER_CONNECTION,
+                idle_timeout=SMTP_IDLE_TIMEOUT,
+                timeout=SMTP_TIMEOUT,
+            )
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,203 @@
+"""
+Inkrementální údržba tabulky audit_stats_monthly.
+
+Všechny funkce jen přidávají změny do aktuální session/transakce –
+commit dělá volající endpoint společně s business změnou.
+
+Klíč řádku je (měsíc kampaně, linka, kategorie, auditor přidělení).
+Počty auditů se vedou pod kategorií přidělení, OK/NOK odpovědi pod
+kategorií otázky (stejně jako původní /stats/by-category).
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .models import (
+    AuditAnswer,
+    AuditExecution,
+    AuditStatsMonthly,
+    ChecklistQuestion,
+    LpaAssignment,
+    LpaCampaign,
+)
+
+COUNTERS = ("executions_count", "done_count", "ok_count", "nok_count")
+
+
+def execution_key(db: Session, assignment_id: int):
+    """Vrátí (month, line_id, category_id, auditor_id) pro přidělení, nebo None"""
+    row = (
+        db.query(
+            LpaCampaign.month,
+            LpaAssignment.line_id,
+            LpaAssignment.category_id,
+            LpaAssignment.auditor_id,
+        )
+        .join(LpaCampaign, LpaAssignment.campaign_id == LpaCampaign.id)
+        .filter(LpaAssignment.id == assignment_id)
+        .first()
+    )
+    if not row:
+        return None
+
+    month, line_id, category_id, auditor_id = row
+    return (month, line_id or 0, category_id or 0, auditor_id or 0)
+
+
+def bump(db: Session, key, **deltas):
+    """Atomicky přičte delty k řádku rollupu (INSERT … ON CONFLICT DO UPDATE)"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not key or not deltas:
+        return
+
+    month, line_id, category_id, auditor_id = key
+    values = {c: deltas.get(c, 0) for c in COUNTERS}
+
+    stmt = insert(AuditStatsMonthly).values(
+        month=month,
+        line_id=line_id,
+        category_id=category_id,
+        auditor_id=auditor_id,
+        **values,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_audit_stats_monthly_key",
+        set_={
+            c: getattr(AuditStatsMonthly, c) + getattr(stmt.excluded, c)
+            for c in deltas
+        },
+    )
+    db.execute(stmt)
+
+
+def record_execution_started(db: Session, assignment_id: int):
+    bump(db, execution_key(db, assignment_id), executions_count=1)
+
+
+def record_audit_finished(db: Session, assignment_id: int):
+    bump(db, execution_key(db, assignment_id), done_count=1)
+
+
+def answer_deltas(old_odpoved: str | None, new_odpoved: str) -> dict:
+    """Změna ok_count/nok_count při přepsání odpovědi old -> new"""
+    deltas = {"ok_count": 0, "nok_count": 0}
+    for value, sign in ((old_odpoved, -1), (new_odpoved, 1)):
+        if value == "OK":
+            deltas["ok_count"] += sign
+        elif value == "NOK":
+            deltas["nok_count"] += sign
+    return deltas
+
+
+def record_answer(
+    db: Session,
+    assignment_id: int,
+    question_category_id: int,
+    old_odpoved: str | None,
+    new_odpoved: str,
+):
+    """Promítne uložení (nebo přepsání) odpovědi do OK/NOK počtů"""
+    record_answers(db, assignment_id, [(question_category_id, old_odpoved, new_odpoved)])
+
+
+def record_answers(db: Session, assignment_id: int, changes):
+    """
+    Hromadná varianta record_answer pro jeden audit.
+    changes = [(question_category_id, old_odpoved, new_odpoved), ...];
+    delty se sečtou po kategoriích, takže stačí jeden upsert na kategorii.
+    """
+    changes = [c for c in changes if c[1] != c[2]]
+    if not changes:
+        return
+
+    key = execution_key(db, assignment_id)
+    if not key:
+        return
+
+    month, line_id, _, auditor_id = key
+
+    by_category = defaultdict(lambda: {"ok_count": 0, "nok_count": 0})
+    for question_category_id, old_odpoved, new_odpoved in changes:
+        totals = by_category[question_category_id or 0]
+        for column, delta in answer_deltas(old_odpoved, new_odpoved).items():
+            totals[column] += delta
+
+    for category_id, deltas in by_category.items():
+        bump(db, (month, line_id, category_id, auditor_id), **deltas)
+
+
+def rebuild(db: Session) -> int:
+    """
+    Smaže a znovu spočítá celý rollup ze zdrojových tabulek.
+    Vrací počet vytvořených řádků; commit dělá volající.
+    """
+    rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    executions = (
+        db.query(
+            LpaCampaign.month,
+            func.coalesce(LpaAssignment.line_id, 0),
+            func.coalesce(LpaAssignment.category_id, 0),
+            func.coalesce(LpaAssignment.auditor_id, 0),
+            func.count(AuditExecution.id),
+            func.count(AuditExecution.id).filter(AuditExecution.status == "done"),
+        )
+        .join(LpaAssignment, AuditExecution.assignment_id == LpaAssignment.id)
+        .join(LpaCampaign, LpaAssignment.campaign_id == LpaCampaign.id)
+        .group_by(
+            LpaCampaign.month,
+            LpaAssignment.line_id,
+            LpaAssignment.category_id,
+            LpaAssignment.auditor_id,
+        )
+        .all()
+    )
+    for month, line_id, category_id, auditor_id, total, done in executions:
+        row = rows[(month, line_id, category_id, auditor_id)]
+        row["executions_count"] += total
+        row["done_count"] += done
+
+    answers = (
+        db.query(
+            LpaCampaign.month,
+            func.coalesce(LpaAssignment.line_id, 0),
+            func.coalesce(ChecklistQuestion.category_id, 0),
+            func.coalesce(LpaAssignment.auditor_id, 0),
+            func.count(AuditAnswer.id).filter(AuditAnswer.odpoved == "OK"),
+            func.count(AuditAnswer.id).filter(AuditAnswer.odpoved == "NOK"),
+        )
+        .join(AuditExecution, AuditAnswer.audit_execution_id == AuditExecution.id)
+        .join(LpaAssignment, AuditExecution.assignment_id == LpaAssignment.id)
+        .join(LpaCampaign, LpaAssignment.campaign_id == LpaCampaign.id)
+        .join(ChecklistQuestion, AuditAnswer.question_id == ChecklistQuestion.id)
+        .group_by(
+            LpaCampaign.month,
+            LpaAssignment.line_id,
+            ChecklistQuestion.category_id,
+            LpaAssignment.auditor_id,
+        )
+        .all()
+    )
+    for month, line_id, category_id, auditor_id, ok, nok in answers:
+        row = rows[(month, line_id, category_id, auditor_id)]
+        row["ok_count"] += ok
+        row["nok_count"] += nok
+
+    db.query(AuditStatsMonthly).delete(synchronize_session=False)
+    db.bulk_insert_mappings(
+        AuditStatsMonthly,
+        [
+            {
+                "month": month,
+                "line_id": line_id,
+                "category_id": category_id,
+                "auditor_id": auditor_id,
+                **counters,
+            }
+            for (month, line_id, category_id, auditor_id), counters in rows.items()
+        ],
+    )
+    return len(rows)
@@ -0,0 +1,154 @@
+"""
+Ukládání fotek z auditů.
+
+Upload se kopíruje po blocích (nikdy celý v paměti) do dočasného souboru,
+typ se určuje podle obsahu (magic bytes), ne podle názvu souboru od klienta,
+a velikost je omezená UPLOAD_MAX_BYTES.
+
+Soubory se ukládají podle SHA-256 obsahu do vnořených adresářů
+(uploads/ab/cd/<hash>.jpg). Stejná fotka se uloží jen jednou, přepsání
+nehrozí a žádný adresář nenaroste na statisíce souborů. Vazba odpověď ->
+fotka je v DB (tabulka photos).
+"""
+
+import hashlib
+import os
+import uuid
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .models import StoredPhoto
+
+load_dotenv()
+
+UPLOAD_DIR = "uploads"
+UPLOAD_TMP_DIR = os.path.join(UPLOAD_DIR, ".tmp")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """Vrátí příponu podle prvních bajtů souboru, nebo None pro nepodporovaný typ"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return ".heic"
+    return None
+
+
+def photo_path(sha256: str, extension: str) -> str:
+    """Cesta v úložišti podle hashe: uploads/ab/cd/abcd….jpg"""
+    return os.path.join(UPLOAD_DIR, sha256[:2], sha256[2:4], sha256 + extension)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StagedUpload:
+    """Fotka zapsaná do dočasného souboru, čeká na přesun na finální místo"""
+
+    def __init__(self, tmp_path: str, extension: str, size: int, sha256: str):
+        self.tmp_path = tmp_path
+        self.extension = extension
+        self.size = size
+        self.sha256 = sha256
+
+    def commit(self) -> str:
+        """
+        Přesune soubor (atomický rename) na místo podle hashe a vrátí jeho cestu.
+        Pokud stejný obsah už v úložišti je, dočasný soubor se jen zahodí.
+        """
+        file_path = photo_path(self.sha256, self.extension)
+        if os.path.exists(file_path):
+            self.discard()
+        else:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(self.tmp_path, file_path)
+        return file_path
+
+    def discard(self):
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def stage_upload(upload: UploadFile) -> StagedUpload:
+    """
+    Po blocích zkopíruje upload do dočasného souboru.
+    415 pro nepodporovaný typ, 413 při překročení UPLOAD_MAX_BYTES.
+    """
+    os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+
+    head = upload.file.read(UPLOAD_CHUNK_BYTES)
+    extension = sniff_image_type(head)
+    if not extension:
+        raise HTTPException(status_code=415, detail="Nepodporovaný formát fotky")
+
+    tmp_path = os.path.join(UPLOAD_TMP_DIR, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(tmp_path, "wb") as f:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Fotka je větší než {UPLOAD_MAX_BYTES // (1024 * 1024)} MB",
+                    )
+                f.write(chunk)
+                digest.update(chunk)
+                chunk = upload.file.read(UPLOAD_CHUNK_BYTES)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return StagedUpload(tmp_path, extension, size, digest.hexdigest())
+
+
+def register_photo(db: Session, sha256: str, path: str, size: int) -> int:
+    """Záznam fotky v tabulce photos (idempotentně podle hashe), vrací photo.id"""
+    photo_id = db.execute(
+        insert(StoredPhoto)
+        .values(sha256=sha256, path=path, size_bytes=size)
+        .on_conflict_do_nothing(index_elements=["sha256"])
+        .returning(StoredPhoto.id)
+    ).scalar()
+    if photo_id is None:
+        photo_id = db.execute(
+            select(StoredPhoto.id).where(StoredPhoto.sha256 == sha256)
+        ).scalar_one()
+    return photo_id
+
+
+def store_photo(db: Session, staged: StagedUpload) -> dict:
+    """
+    Uloží fotku do úložiště a zaregistruje ji v DB.
+    Vrací hodnoty pro odpověď: {"photo_id", "picture_url"}.
+    """
+    path = staged.commit()
+    return {
+        "photo_id": register_photo(db, staged.sha256, path, staged.size),
+        "picture_url": path,
+    }
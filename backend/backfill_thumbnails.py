@@ -0,0 +1,53 @@
+"""
+Dogeneruje chybějící náhledy (thumbnail + střední náhled) pro všechny fotky v DB.
+Spusťte: python backfill_thumbnails.py [--force]
+"""
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from app.database import SessionLocal
+from app.models import AuditAnswer
+from app.photo_derivatives import PHOTO_WORKERS, Image, generate_derivatives
+
+
+def main():
+    if Image is None:
+        sys.exit("Chybí Pillow: pip install pillow")
+
+    force = "--force" in sys.argv
+
+    db = SessionLocal()
+    try:
+        picture_urls = [
+            url
+            for (url,) in db.query(AuditAnswer.picture_url)
+            .filter(AuditAnswer.picture_url.isnot(None))
+            .distinct()
+        ]
+    finally:
+        db.close()
+
+    print(f"Fotek ke zpracování: {len(picture_urls)}")
+
+    created = 0
+    failed = 0
+
+    # worker procesy jen pro dekódování/zmenšení, DB zůstává v hlavním procesu
+    with ProcessPoolExecutor(max_workers=PHOTO_WORKERS) as executor:
+        futures = {
+            executor.submit(generate_derivatives, url, force): url
+            for url in picture_urls
+        }
+        for future, url in futures.items():
+            try:
+                created += len(future.result())
+            except Exception as e:
+                failed += 1
+                print(f"  ✗ {url}: {e}")
+
+    print(f"Hotovo: vytvořeno {created} náhledů, chyb: {failed}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark odesílání emailů: nové spojení na každou zprávu vs. pool spojení.
+Spustí lokální SMTP sink (smtp_sink.py) a změří zprávy za sekundu.
+Spusťte: python benchmark_smtp.py [--messages 200] [--latency 0.005] [--auth-delay 0.05] [--pool-size 4]
+
+Sink nepodporuje STARTTLS, takže měření "před" je ve skutečnosti ještě
+optimistické – u reálného serveru stojí každé nové spojení navíc TLS
+handshake.
+"""
+
+import argparse
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from app.smtp_pool import SMTPConnectionPool
+from smtp_sink import SMTPSink
+
+USER = "benchmark@lpa.local"
+PASSWORD = "benchmark"
+
+
+def build_message(index: int):
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = f"Nový audit: Linka {index} - Kategorie"
+    msg["From"] = f"LPA <{USER}>"
+    msg["To"] = f"auditor{index}@lpa.local"
+    msg.attach(MIMEText(f"Byl Vám přidělen audit č. {index}.", "plain", "utf-8"))
+    msg.attach(MIMEText(f"<p>Byl Vám přidělen audit č. <b>{index}</b>.</p>" * 20, "html", "utf-8"))
+    return msg
+
+
+def send_per_message(sink: SMTPSink, messages: list):
+    """Původní chování EmailService – spojení a přihlášení pro každou zprávu"""
+    for msg in messages:
+        with smtplib.SMTP(sink.host, sink.port) as server:
+            server.login(USER, PASSWORD)
+            server.send_message(msg)
+
+
+def send_pooled(pool: SMTPConnectionPool, messages: list, threads: int):
+    if threads == 1:
+        for msg in messages:
+            pool.send_message(msg)
+        return
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(pool.send_message, messages))
+
+
+def measure(label: str, sink: SMTPSink, run) -> float:
+    messages_before, connections_before = sink.messages, sink.connections
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+
+    sent = sink.messages - messages_before
+    rate = sent / elapsed
+    print(
+        f"{label:<32} {sent:>5} zpráv  {elapsed:7.2f} s  {rate:8.1f} zpráv/s  "
+        f"{sink.connections - connections_before:>4} spojení"
+    )
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SMTP odesílání")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005, help="zpoždění odpovědi serveru (s)")
+    parser.add_argument("--auth-delay", type=float, default=0.05, help="zpoždění přihlášení (s)")
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    sink = SMTPSink(port=0, latency=args.latency, auth_delay=args.auth_delay).start_in_thread()
+    messages = [build_message(i) for i in range(args.messages)]
+
+    def new_pool(size: int) -> SMTPConnectionPool:
+        return SMTPConnectionPool(
+            sink.host, sink.port, USER, PASSWORD, starttls=False, max_connections=size
+        )
+
+    print(
+        f"SMTP sink localhost:{sink.port}, latence {args.latency * 1000:.0f} ms, "
+        f"přihlášení {args.auth_delay * 1000:.0f} ms\n"
+    )
+
+    baseline = measure("Spojení na každou zprávu", sink, lambda: send_per_message(sink, messages))
+
+    single = new_pool(1)
+    pooled = measure("Pool, 1 spojení", sink, lambda: send_pooled(single, messages, 1))
+    single.close()
+
+    concurrent = new_pool(args.pool_size)
+    parallel = measure(
+        f"Pool, {args.pool_size} spojení souběžně",
+        sink,
+        lambda: send_pooled(concurrent, messages, args.pool_size),
+    )
+    concurrent.close()
+
+    print(f"\nZrychlení: pool {pooled / baseline:.1f}x, pool souběžně {parallel / baseline:.1f}x")
+    sink.stop()
+
+
+if __name__ == "__main__":
+    main()
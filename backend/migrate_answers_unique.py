@@ -0,0 +1,41 @@
+"""
+Odstraní duplicitní odpovědi (ponechá nejnovější) a přidá unikátní
+omezení (audit_execution_id, question_id) na audit_answers.
+Spusťte: python migrate_answers_unique.py
+Poté přepočítejte počitadla: migrate_execution_counters.py a rebuild_stats.py
+"""
+
+from sqlalchemy import text
+
+from app.database import engine
+
+with engine.begin() as conn:
+    removed = conn.execute(
+        text(
+            """
+            DELETE FROM audit_answers AS a
+            USING audit_answers AS newer
+            WHERE a.audit_execution_id = newer.audit_execution_id
+              AND a.question_id = newer.question_id
+              AND a.id < newer.id
+            """
+        )
+    ).rowcount
+
+    exists = conn.execute(
+        text(
+            "SELECT 1 FROM pg_constraint "
+            "WHERE conname = 'uq_audit_answers_execution_question'"
+        )
+    ).first()
+
+    if not exists:
+        conn.execute(
+            text(
+                "ALTER TABLE audit_answers "
+                "ADD CONSTRAINT uq_audit_answers_execution_question "
+                "UNIQUE (audit_execution_id, question_id)"
+            )
+        )
+
+print(f"Odstraněno {removed} duplicitních odpovědí, unikátní omezení je aktivní.")
@@ -0,0 +1,23 @@
+"""
+Přidá users.audit_capacity (max. počet auditů za měsíc pro optimalizaci
+přidělování) a index lpa_assignments.campaign_id pro načítání historie
+přidělení při rotaci.
+Spusťte: python migrate_audit_capacity.py
+"""
+
+from sqlalchemy import text
+
+from app.database import engine
+
+with engine.begin() as conn:
+    conn.execute(
+        text("ALTER TABLE users ADD COLUMN IF NOT EXISTS audit_capacity INTEGER")
+    )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_lpa_assignments_campaign_id "
+            "ON lpa_assignments (campaign_id)"
+        )
+    )
+
+print("Sloupec users.audit_capacity a index ix_lpa_assignments_campaign_id jsou připraveny.")
@@ -0,0 +1,20 @@
+"""
+Přidá users.email_delivery – zda auditor dostává o nových auditech jeden
+souhrnný email za kampaň ("digest", výchozí), nebo email ke každému
+auditu ("immediate").
+Spusťte: python migrate_email_delivery.py
+"""
+
+from sqlalchemy import text
+
+from app.database import engine
+
+with engine.begin() as conn:
+    conn.execute(
+        text(
+            "ALTER TABLE users "
+            "ADD COLUMN IF NOT EXISTS email_delivery VARCHAR NOT NULL DEFAULT 'digest'"
+        )
+    )
+
+print("Sloupec users.email_delivery je připraven (výchozí 'digest').")
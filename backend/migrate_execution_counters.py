@@ -0,0 +1,40 @@
+"""
+Přidá sloupce ok_count / nok_count / total_count do audit_execution
+a naplní je z existujících odpovědí.
+Spusťte: python migrate_execution_counters.py
+"""
+
+from sqlalchemy import text
+
+from app.database import engine
+
+with engine.begin() as conn:
+    for column in ("ok_count", "nok_count", "total_count"):
+        conn.execute(
+            text(
+                f"ALTER TABLE audit_execution "
+                f"ADD COLUMN IF NOT EXISTS {column} INTEGER NOT NULL DEFAULT 0"
+            )
+        )
+
+    result = conn.execute(
+        text(
+            """
+            UPDATE audit_execution AS e
+            SET ok_count = a.ok_count,
+                nok_count = a.nok_count,
+                total_count = a.total_count
+            FROM (
+                SELECT audit_execution_id,
+                       COUNT(*) FILTER (WHERE odpoved = 'OK') AS ok_count,
+                       COUNT(*) FILTER (WHERE odpoved = 'NOK') AS nok_count,
+                       COUNT(*) AS total_count
+                FROM audit_answers
+                GROUP BY audit_execution_id
+            ) AS a
+            WHERE a.audit_execution_id = e.id
+            """
+        )
+    )
+
+print(f"Počitadla odpovědí doplněna pro {result.rowcount} auditů.")
@@ -0,0 +1,13 @@
+"""
+Vytvoří index (started_at, id) na audit_execution pro stránkování přehledu auditů.
+Spusťte: python migrate_execution_list_index.py
+"""
+
+from app.database import engine
+from app.models import AuditExecution
+
+for index in AuditExecution.__table__.indexes:
+    if index.name == "ix_audit_execution_started_at_id":
+        index.create(bind=engine, checkfirst=True)
+
+print("Index pro stránkování auditů je připraven.")
@@ -0,0 +1,80 @@
+"""
+Přidá neshody.answer_id (vazba neshoda -> NOK odpověď) a propojí existující
+neshody s odpověďmi tam, kde je párování jednoznačné.
+Spusťte: python migrate_neshody_answer.py
+
+Staré neshody nevědí, ke které otázce patří (odpověď ani otázku neukládaly,
+každé uložení NOK přidalo novou). Automaticky se proto propojí jen audit
+s jedinou NOK odpovědí a jedinou neshodou. Ostatní neshody zůstanou bez
+answer_id a nic se nemaže – seznam auditů k ruční kontrole vypíše skript.
+"""
+
+from sqlalchemy import text
+
+from app.database import engine
+
+with engine.begin() as conn:
+    conn.execute(
+        text(
+            "ALTER TABLE neshody "
+            "ADD COLUMN IF NOT EXISTS answer_id INTEGER REFERENCES audit_answers(id)"
+        )
+    )
+
+    linked = conn.execute(
+        text(
+            """
+            WITH single_nok AS (
+                SELECT audit_execution_id, MIN(id) AS answer_id
+                FROM audit_answers
+                WHERE odpoved = 'NOK'
+                GROUP BY audit_execution_id
+                HAVING COUNT(*) = 1
+            ),
+            single_neshoda AS (
+                SELECT audit_execution_id, MIN(id) AS neshoda_id
+                FROM neshody
+                GROUP BY audit_execution_id
+                HAVING COUNT(*) = 1
+            )
+            UPDATE neshody AS n
+            SET answer_id = a.answer_id
+            FROM single_nok AS a
+            JOIN single_neshoda AS s ON s.audit_execution_id = a.audit_execution_id
+            WHERE n.id = s.neshoda_id
+              AND n.answer_id IS NULL
+              AND NOT EXISTS (SELECT 1 FROM neshody WHERE answer_id = a.answer_id)
+            """
+        )
+    ).rowcount
+
+    to_review = conn.execute(
+        text(
+            """
+            SELECT audit_execution_id, COUNT(*)
+            FROM neshody
+            WHERE answer_id IS NULL
+            GROUP BY audit_execution_id
+            ORDER BY audit_execution_id
+            """
+        )
+    ).all()
+
+    exists = conn.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = 'uq_neshody_answer'")
+    ).first()
+
+    if not exists:
+        conn.execute(
+            text(
+                "ALTER TABLE neshody "
+                "ADD CONSTRAINT uq_neshody_answer UNIQUE (answer_id)"
+            )
+        )
+
+print(f"Propojeno {linked} neshod s odpověďmi.")
+if to_review:
+    total = sum(count for _, count in to_review)
+    print(f"Bez odpovědi zůstalo {total} neshod – zkontrolujte je ručně (audit: počet):")
+    for execution_id, count in to_review:
+        print(f"  {execution_id}: {count}")
@@ -0,0 +1,86 @@
+"""
+Převede fotky z plochého uploads/ do úložiště podle obsahu (uploads/ab/cd/<hash>.jpg),
+vytvoří tabulku photos a propojí odpovědi přes audit_answers.photo_id.
+Spusťte: python migrate_photo_storage.py
+Poté dogenerujte náhledy: python backfill_thumbnails.py
+"""
+
+import os
+import shutil
+
+from sqlalchemy import text
+
+from app.database import engine, SessionLocal, Base
+from app.models import StoredPhoto
+from app.uploads import file_sha256, photo_path, register_photo
+
+Base.metadata.create_all(bind=engine, tables=[StoredPhoto.__table__])
+
+with engine.begin() as conn:
+    conn.execute(
+        text(
+            "ALTER TABLE audit_answers "
+            "ADD COLUMN IF NOT EXISTS photo_id INTEGER REFERENCES photos(id)"
+        )
+    )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_audit_answers_photo_id "
+            "ON audit_answers (photo_id)"
+        )
+    )
+
+db = SessionLocal()
+
+moved = 0
+deduplicated = 0
+missing = []
+
+try:
+    old_paths = [
+        path
+        for (path,) in db.execute(
+            text(
+                "SELECT DISTINCT picture_url FROM audit_answers "
+                "WHERE picture_url IS NOT NULL AND photo_id IS NULL"
+            )
+        )
+    ]
+
+    for old_path in old_paths:
+        if not os.path.isfile(old_path):
+            missing.append(old_path)
+            continue
+
+        sha256 = file_sha256(old_path)
+        extension = os.path.splitext(old_path)[1].lower()
+        new_path = photo_path(sha256, extension)
+
+        if os.path.exists(new_path):
+            deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            shutil.copy2(old_path, new_path)
+            moved += 1
+
+        photo_id = register_photo(db, sha256, new_path, os.path.getsize(new_path))
+        db.execute(
+            text(
+                "UPDATE audit_answers SET photo_id = :photo_id, picture_url = :new_path "
+                "WHERE picture_url = :old_path"
+            ),
+            {"photo_id": photo_id, "new_path": new_path, "old_path": old_path},
+        )
+        db.commit()
+
+        # starý soubor mažeme až po commitu, kdy na něj už nic neodkazuje
+        if os.path.abspath(old_path) != os.path.abspath(new_path):
+            os.remove(old_path)
+finally:
+    db.close()
+
+print(f"Přesunuto {moved} fotek, {deduplicated} duplicit sloučeno.")
+if missing:
+    print(f"Chybějící soubory ({len(missing)}):")
+    for path in missing:
+        print(f"  ✗ {path}")
@@ -0,0 +1,36 @@
+"""
+Vytvoří fulltextové (GIN tsvector) a trigramové (pg_trgm) indexy pro /search/findings.
+Spusťte: python migrate_search_indexes.py
+Výrazy musí odpovídat app/routers/search.py.
+"""
+
+from sqlalchemy import text
+
+from app.database import engine
+
+INDEXES = {
+    "ix_checklist_questions_text_fts": (
+        "checklist_questions USING gin "
+        "(to_tsvector('simple'::regconfig, question_text))"
+    ),
+    "ix_neshody_text_fts": (
+        "neshody USING gin "
+        "(to_tsvector('simple'::regconfig, "
+        "(coalesce(popis, '') || ' ') || coalesce(poznamka, '')))"
+    ),
+    "ix_checklist_questions_text_trgm": "checklist_questions USING gin (question_text gin_trgm_ops)",
+    "ix_neshody_popis_trgm": "neshody USING gin (popis gin_trgm_ops)",
+    "ix_neshody_poznamka_trgm": "neshody USING gin (poznamka gin_trgm_ops)",
+    # join neshoda -> odpověď a filtr NOK
+    "ix_neshody_answer_id": "neshody (answer_id)",
+    "ix_audit_answers_nok": "audit_answers (audit_execution_id) WHERE odpoved = 'NOK'",
+    # nalezené otázky -> jejich NOK odpovědi
+    "ix_audit_answers_question_nok": "audit_answers (question_id) WHERE odpoved = 'NOK'",
+}
+
+with engine.begin() as conn:
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for name, definition in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+
+print(f"Indexy pro vyhledávání připraveny ({len(INDEXES)}).")
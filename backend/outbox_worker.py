@@ -0,0 +1,22 @@
+"""
+Samostatný worker pro odesílání emailů z outboxu.
+Použijte při více API procesech (v .env pak OUTBOX_WORKER_ENABLED=0).
+Spusťte: python outbox_worker.py        – běží trvale
+         python outbox_worker.py --once – jen odešle, co je splatné
+"""
+
+import logging
+import sys
+
+from app import outbox
+
+logging.basicConfig(level=logging.INFO)
+
+if "--once" in sys.argv:
+    print(f"Zpracováno {outbox.drain()} emailů.")
+else:
+    print("Outbox worker běží (Ctrl+C pro ukončení)...")
+    try:
+        outbox.run_worker()
+    except KeyboardInterrupt:
+        pass
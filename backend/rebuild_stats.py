@@ -0,0 +1,19 @@
+"""
+Přepočítá tabulku audit_stats_monthly ze zdrojových dat.
+Spusťte: python rebuild_stats.py
+"""
+
+from app.database import SessionLocal, engine, Base
+from app.stats_rollup import rebuild
+
+Base.metadata.create_all(bind=engine)
+
+db = SessionLocal()
+
+try:
+    count = rebuild(db)
+    db.commit()
+finally:
+    db.close()
+
+print(f"Rollup statistik přepočítán ({count} řádků).")
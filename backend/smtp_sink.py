@@ -0,0 +1,119 @@
+"""
+Lokální SMTP server pro vývoj a benchmark – zprávy přijme a zahodí.
+Spusťte: python smtp_sink.py [--port 1025] [--latency 0.02] [--auth-delay 0.1]
+
+V .env pak: SMTP_HOST=localhost, SMTP_PORT=1025, SMTP_STARTTLS=0.
+
+--latency    zpoždění každé odpovědi (simuluje round-trip k reálnému serveru)
+--auth-delay zpoždění přihlášení (ověření hesla na straně serveru)
+
+Přihlášení (AUTH PLAIN / LOGIN) přijme s libovolným heslem, STARTTLS
+nepodporuje.
+"""
+
+import argparse
+import asyncio
+import threading
+
+
+class SMTPSink:
+    def __init__(self, host: str = "localhost", port: int = 1025, latency: float = 0, auth_delay: float = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.auth_delay = auth_delay
+        self.connections = 0
+        self.messages = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+
+    async def _reply(self, writer: asyncio.StreamWriter, line: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(f"{line}\r\n".encode("ascii"))
+        await writer.drain()
+
+    async def _authenticate(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, args: list[str]):
+        # PLAIN: jedna odpověď s údaji, LOGIN: jméno a heslo zvlášť
+        mechanism = args[0].upper() if args else ""
+        prompts = ["334 VXNlcm5hbWU6", "334 UGFzc3dvcmQ6"] if mechanism == "LOGIN" else ["334 "]
+        # úvodní odpověď poslaná rovnou s příkazem AUTH nahrazuje první výzvu
+        for prompt in prompts[len(args) - 1:]:
+            await self._reply(writer, prompt)
+            await reader.readline()
+        if self.auth_delay:
+            await asyncio.sleep(self.auth_delay)
+        await self._reply(writer, "235 Authentication successful")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await self._reply(writer, "220 localhost LPA SMTP sink")
+        try:
+            while line := await reader.readline():
+                command = line.decode("ascii", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb in ("EHLO", "HELO"):
+                    await self._reply(writer, "250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+                elif verb == "AUTH":
+                    await self._authenticate(reader, writer, command.split()[1:])
+                elif verb == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    await self._reply(writer, "250 OK: queued")
+                elif verb == "QUIT":
+                    await self._reply(writer, "221 Bye")
+                    break
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await self._reply(writer, "250 OK")
+                else:
+                    await self._reply(writer, "502 Command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, started: threading.Event | None = None):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if started is not None:
+            started.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def start_in_thread(self) -> "SMTPSink":
+        """Spustí server ve vlákně na pozadí (pro benchmark), čeká na start"""
+        started = threading.Event()
+        threading.Thread(target=asyncio.run, args=(self.serve(started),), daemon=True).start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokální SMTP server, který zprávy zahazuje")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--auth-delay", type=float, default=0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.latency, args.auth_delay)
+    print(f"SMTP sink běží na {args.host}:{args.port} (Ctrl+C pro ukončení)...")
+    try:
+        asyncio.run(sink.serve())
+    except KeyboardInterrupt:
+        print(f"Přijato {sink.messages} zpráv v {sink.connections} spojeních.")
+
+
+if __name__ == "__main__":
+    main()
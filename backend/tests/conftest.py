@@ -0,0 +1,5 @@
+import os
+import sys
+
+# testy importují balíček app/ stejně jako skripty v backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
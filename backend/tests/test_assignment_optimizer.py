@@ -0,0 +1,52 @@
+from collections import Counter
+
+import pytest
+from fastapi import HTTPException
+
+from app.assignment_optimizer import plan_assignments
+
+
+def _loads(plan):
+    return Counter(auditor_id for _, auditor_id, _ in plan)
+
+
+def test_high_capacity_does_not_pull_work_from_uncapped_auditors():
+    auditors = [(a, None) for a in range(1, 10)] + [(10, 20)]
+    loads = _loads(plan_assignments(list(range(50)), auditors, [1, 2]))
+
+    assert set(loads.values()) == {5}
+
+
+def test_capped_auditor_gets_no_more_than_fair_share():
+    loads = _loads(plan_assignments(list(range(10)), [(1, 100), (2, None)], [1]))
+
+    assert loads == {1: 5, 2: 5}
+
+
+def test_capacity_is_hard_limit():
+    auditors = [(1, 2), (2, None), (3, None), (4, None), (5, None)]
+    loads = _loads(plan_assignments(list(range(20)), auditors, [1]))
+
+    assert loads[1] == 2
+    assert sum(loads.values()) == 20
+    assert max(loads[a] for a in (2, 3, 4, 5)) - min(loads[a] for a in (2, 3, 4, 5)) <= 1
+
+
+def test_capacity_too_small_for_all_lines():
+    with pytest.raises(HTTPException):
+        plan_assignments(list(range(5)), [(1, 2), (2, 2)], [1])
+
+
+def test_rotation_avoids_last_month_auditor_and_category():
+    lines = list(range(1, 21))
+    auditors = [(a, None) for a in range(1, 6)]
+    categories = [1, 2, 3]
+
+    previous = plan_assignments(lines, auditors, categories)
+    history = [(1, a, line, c) for line, a, c in previous]
+    current = plan_assignments(lines, auditors, categories, history)
+
+    for (line, old_auditor, old_category), (_, auditor, category) in zip(previous, current):
+        assert auditor != old_auditor
+        assert category != old_category
+    assert set(_loads(current).values()) == {4}
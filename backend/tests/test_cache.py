@@ -0,0 +1,15 @@
+from app.cache import TTLCache
+
+
+def test_delete_where_evicts_only_matching_entries():
+    cache = TTLCache(ttl=60, max_size=10)
+    cache.set(1, {"audit_info": {"execution_id": 7}})
+    cache.set(2, {"audit_info": {"execution_id": 8}})
+    cache.set(3, {"audit_info": {"execution_id": 7}})
+
+    cache.delete_where(lambda detail: detail["audit_info"]["execution_id"] == 7)
+
+    assert cache.get(1) == (False, None)
+    assert cache.get(3) == (False, None)
+    assert cache.get(2) == (True, {"audit_info": {"execution_id": 8}})
+    assert cache.stats()["invalidations"] == 2
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.mark.parametrize(
+    "role, roles",
+    [
+        ("auditor", None),
+        ("auditor", ""),
+        ("solver", "solver,auditor"),
+        ("auditor", "auditor"),
+        ("solver", None),
+        ("auditor", "solver"),
+        ("admin", "admin,solver"),
+    ],
+)
+def test_role_filter_matches_has_role(db, role, roles):
+    user = User(jmeno="Test", email="test@lpa.local", role=role, roles=roles)
+    db.add(user)
+    db.flush()
+
+    found = db.query(User).filter(User.role_filter("auditor")).all()
+
+    assert (user in found) == user.has_role("auditor")
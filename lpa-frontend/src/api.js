@@ -32,4 +32,11 @@ api.interceptors.response.use(
   }
 );
 
+// URL fotky pro <img src> – z podepsané cesty (*_src) z API odpovědi,
+// session token do URL nepatří (logy, historie, Referer, cache)
+export function photoUrl(src) {
+  if (!src) return "";
+  return `${api.defaults.baseURL}/${src}`;
+}
+
 export default api;
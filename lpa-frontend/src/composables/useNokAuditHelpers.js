@@ -1,4 +1,5 @@
 import { computed } from 'vue'
+import { photoUrl } from '../api'
 
 export function useNokAuditHelpers() {
     const formatDate = (dateString) => {
@@ -52,11 +53,7 @@ export function useNokAuditHelpers() {
         return text.length > length ? text.substring(0, length) + '...' : text
     }
 
-    const getImageUrl = (path) => {
-        if (!path) return ''
-        const baseUrl = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000'
-        return `${baseUrl}/${path}`
-    }
+    const getImageUrl = (path) => photoUrl(path)
 
     const exportToCSV = (data, filename = 'export.csv') => {
         if (!data || data.length === 0) {